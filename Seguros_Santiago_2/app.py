@@ -1,20 +1,80 @@
-from flask import Flask, render_template, request, redirect, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, session, flash, jsonify, send_file, abort, Response, stream_with_context, make_response
+from flask.json.provider import DefaultJSONProvider
 from auth import AuthSystem
-from crud_model import CRUDModel
+from passwords import PasswordBusyError
+from crud_model import CRUDModel, CLIENT_FILTER_COLUMNS, UPDATED, UNCHANGED, CONFLICT, BULK_NOT_FOUND, changed_fields
+from client_import import ClientImporter, expire_reports, report_path
+from client_export import EXPORT_FORMATS, EXPORT_PROJECTION
+from collections import Counter
 from functools import wraps
 import logging
+import io
+import os
+import time
 
-# Configurar logging más detallado
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+import config
+import database
+import logging_setup
+import metrics
+
+# Logging asíncrono en JSON: los requests solo encolan los eventos
+logging_setup.configure_logging()
 logger = logging.getLogger(__name__)
 
+class RecordJSONProvider(DefaultJSONProvider):
+    """jsonify de las filas compactas (database.Record) como objetos"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, database.Record):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
+
 app = Flask(__name__)
+app.json = RecordJSONProvider(app)
 app.secret_key = 'seguros_santiago_secret_key_2024'
 auth = AuthSystem()
 crud = CRUDModel()
+if config.CATALOG_CACHE_WARMUP:
+    crud.warm_catalogs()
+if config.SEARCH_INDEX_WARMUP:
+    crud.search_index.rebuild()
+
+# Clientes por página en /agent/clients
+CLIENTS_PER_PAGE = 50
+
+# Clientes recientes que muestra el dashboard del agente
+DASHBOARD_RECENT_CLIENTS = 5
+
+# Métricas por request: cantidad de consultas y tiempo en base de datos
+@app.before_request
+def start_request_metrics():
+    route = request.url_rule.rule if request.url_rule else 'sin_ruta'
+    metrics.start_request(route)
+
+# Lecturas a réplicas, salvo en la ventana posterior a una escritura de la sesión
+@app.before_request
+def start_request_routing():
+    database.begin_routing(primary=session.get('primary_until', 0) > time.time())
+
+@app.after_request
+def finish_request_routing(response):
+    routing = database.current_routing()
+    if routing and routing.wrote:
+        session['primary_until'] = time.time() + config.DB_READ_YOUR_WRITES_SECONDS
+    return response
+
+@app.after_request
+def finish_request_metrics(response):
+    stats = metrics.finish_request()
+    if stats:
+        response.headers['X-DB-Queries'] = str(stats.queries)
+        response.headers['X-DB-Time-Ms'] = f"{stats.db_time * 1000:.1f}"
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 # Decoradores de autenticación
 def login_required(f):
@@ -30,7 +90,7 @@ def agent_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session or session.get('role') != 1:
-            logger.warning(f"Acceso denegado a agente: user_id={session.get('user_id')}, role={session.get('role')}")
+            logger.warning("Acceso denegado a agente: user_id=%s, role=%s", session.get('user_id'), session.get('role'))
             flash('Acceso restringido a agentes', 'error')
             return redirect('/dashboard')
         return f(*args, **kwargs)
@@ -40,12 +100,51 @@ def client_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session or session.get('role') != 2:
-            logger.warning(f"Acceso denegado a cliente: user_id={session.get('user_id')}, role={session.get('role')}")
+            logger.warning("Acceso denegado a cliente: user_id=%s, role=%s", session.get('user_id'), session.get('role'))
             flash('Acceso restringido a clientes', 'error')
             return redirect('/dashboard')
         return f(*args, **kwargs)
     return decorated_function
 
+def get_own_client():
+    """
+    Cliente asociado al usuario en sesión, con sus joins, en una sola consulta.
+    Usa el id_cliente guardado en la sesión al hacer login; si el cliente ya no
+    pertenece al usuario, se vuelve a resolver por id_usuario y se actualiza la sesión.
+    """
+    client_id = session.get('client_id')
+    if client_id:
+        client = crud.get_client_by_id(client_id)
+        if client and client['id_usuario'] == session['user_id']:
+            return client
+    
+    client = crud.get_client_by_user_id(session['user_id'])
+    session['client_id'] = client['id_cliente'] if client else None
+    return client
+
+def client_etag(scope, client_id, version):
+    """ETag de una vista de cliente: cambia con la versión de la fila"""
+    return f"{scope}-{client_id}-v{version}-{config.ETAG_SALT}"
+
+def not_modified(etag):
+    """
+    Respuesta 304 si el navegador ya tiene esta versión, o None.
+    No se usa cuando hay mensajes flash pendientes, que se muestran en la página.
+    """
+    if etag in request.if_none_match and not session.get('_flashes'):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return None
+
+def with_etag(body, etag):
+    """Agrega el ETag a una respuesta completa y obliga a revalidar antes de reutilizarla"""
+    response = make_response(body)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
 # Rutas de Autenticación
 @app.route('/')
 def index():
@@ -57,15 +156,17 @@ def login():
         username = request.form.get('username', '').strip()
         password = request.form.get('password', '')
         
-        logger.info(f"Intento de login - Usuario: {username}")
-        
         # Validaciones básicas
         if not username or not password:
             flash('Por favor ingrese usuario y contraseña', 'error')
             return render_template('login.html')
         
         # Intentar autenticación
-        user = auth.login(username, password)
+        try:
+            user = auth.login(username, password)
+        except PasswordBusyError:
+            flash('El servicio está ocupado. Intente nuevamente en unos segundos.', 'error')
+            return render_template('login.html'), 503
         
         if user:
             # Configurar sesión
@@ -73,8 +174,7 @@ def login():
             session['username'] = user['nombre_usuario']
             session['role'] = user['id_rol']
             session['role_name'] = user['nombre_rol']
-            
-            logger.info(f"Login exitoso - Usuario: {username}, Rol: {user['nombre_rol']}, ID: {user['id_usuario']}")
+            session['client_id'] = user.get('id_cliente')  # mapeo usuario -> cliente resuelto una vez
             
             # Redireccionar según el rol
             if user['id_rol'] == 1:  # Agente
@@ -84,10 +184,9 @@ def login():
                 flash(f'Bienvenido, {user["nombre_usuario"]}', 'success')
                 return redirect('/client/dashboard')
             else:
-                logger.error(f"Rol desconocido: {user['id_rol']}")
+                logger.error("Rol desconocido: %s", user['id_rol'])
                 flash('Rol de usuario no válido', 'error')
         else:
-            logger.warning(f"Login fallido - Usuario: {username}")
             flash('Credenciales inválidas. Verifique su usuario y contraseña.', 'error')
     
     return render_template('login.html')
@@ -96,7 +195,7 @@ def login():
 def logout():
     username = session.get('username', 'Usuario desconocido')
     session.clear()
-    logger.info(f"Logout exitoso - Usuario: {username}")
+    logger.info("Logout exitoso - Usuario: %s", username)
     flash('Sesión cerrada correctamente', 'success')
     return redirect('/login')
 
@@ -109,6 +208,15 @@ def debug_users():
     else:
         return jsonify({'error': 'Acceso denegado'}), 403
 
+# Estadísticas del pool de conexiones y de la caché de catálogos (solo en desarrollo)
+@app.route('/debug/pool')
+def debug_pool():
+    if app.debug:
+        return jsonify({'pool': crud.db.pool_stats(), 'catalogs': crud.catalogs.stats(),
+                        'search_index': crud.search_index.stats(), 'logging': logging_setup.stats()})
+    else:
+        return jsonify({'error': 'Acceso denegado'}), 403
+
 # Dashboard general que redirige según el rol
 @app.route('/dashboard')
 @login_required
@@ -128,11 +236,18 @@ def dashboard():
 @agent_required
 def agent_dashboard():
     try:
-        clients = crud.get_all_clients()
-        logger.info(f"Dashboard agente cargado - {len(clients) if clients else 0} clientes")
-        return render_template('dashboard_agent.html', clients=clients)
+        data = crud.db.gather({
+            'portfolio': crud.get_portfolio_stats,
+            'recent_clients': lambda: crud.get_recent_clients(DASHBOARD_RECENT_CLIENTS),
+        })
+        portfolio = data['portfolio'] or {}
+        summary = portfolio.get('resumen') or {'total_clientes': 0, 'carga_familiar_total': 0}
+        recent_clients = data['recent_clients'] or []
+        logger.info("Dashboard agente cargado - %s clientes", summary['total_clientes'])
+        return render_template('dashboard_agent.html', summary=summary, portfolio=portfolio.get('desglose'),
+                               recent_clients=recent_clients)
     except Exception as e:
-        logger.error(f"Error cargando dashboard agente: {e}")
+        logger.error("Error cargando dashboard agente: %s", e)
         flash('Error cargando el dashboard', 'error')
         return redirect('/logout')
 
@@ -142,33 +257,28 @@ def agent_dashboard():
 @client_required
 def client_dashboard():
     try:
-        # Primero obtener el ID del cliente asociado al usuario
-        client_id_query = """
-            SELECT id_cliente FROM Clientes WHERE id_usuario = %s
-        """
-        client_id_result = crud.db.execute_query(client_id_query, (session['user_id'],))
-        
-        if not client_id_result or len(client_id_result) == 0:
-            logger.warning(f"No se encontró cliente para user_id: {session['user_id']}")
-            flash('No se encontraron datos del cliente. Contacte al administrador.', 'error')
-            return redirect('/logout')
+        # GET condicional: solo se consulta la versión de la fila
+        client_id = session.get('client_id')
+        if client_id and request.if_none_match:
+            version = crud.get_client_version(client_id, session['user_id'])
+            if version is not None:
+                cached = not_modified(client_etag('dashboard', client_id, version))
+                if cached:
+                    return cached
         
-        client_id = client_id_result[0]['id_cliente']
-        logger.info(f"Obteniendo datos del cliente ID: {client_id}")
-        
-        # Usar el método existente que trae todos los datos con joins
-        client = crud.get_client_by_id(client_id)
+        client = get_own_client()
         
         if client:
-            logger.info(f"Cliente encontrado: {client['nombre']} {client['apellido']}")
-            return render_template('dashboard_client.html', client=client)
+            logger.info("Cliente encontrado: %s %s", client['nombre'], client['apellido'])
+            return with_etag(render_template('dashboard_client.html', client=client),
+                             client_etag('dashboard', client['id_cliente'], client['version']))
         else:
-            logger.warning(f"No se encontraron datos del cliente para ID: {client_id}")
+            logger.warning("No se encontró cliente para user_id: %s", session['user_id'])
             flash('No se encontraron datos del cliente. Contacte al administrador.', 'error')
             return redirect('/logout')
             
     except Exception as e:
-        logger.error(f"Error cargando dashboard cliente: {str(e)}")
+        logger.error("Error cargando dashboard cliente: %s", e)
         flash('Error cargando sus datos', 'error')
         return redirect('/logout')
 
@@ -178,62 +288,56 @@ def client_dashboard():
 @client_required
 def client_edit_own():
     try:
-        # Obtener el cliente asociado al usuario usando el método existente
-        client_id_query = "SELECT id_cliente FROM Clientes WHERE id_usuario = %s"
-        client_id_result = crud.db.execute_query(client_id_query, (session['user_id'],))
-        
-        if not client_id_result or len(client_id_result) == 0:
-            logger.warning(f"Cliente no encontrado para user_id: {session['user_id']}")
-            flash('No se encontraron datos del cliente', 'error')
-            return redirect('/client/dashboard')
-        
-        client_id = client_id_result[0]['id_cliente']
-        client = crud.get_client_by_id(client_id)
+        client = get_own_client()
         
         if not client:
-            logger.warning(f"Cliente no encontrado para ID: {client_id}")
+            logger.warning("Cliente no encontrado para user_id: %s", session['user_id'])
             flash('No se encontraron datos del cliente', 'error')
             return redirect('/client/dashboard')
         
+        client_id = client['id_cliente']
+        conflicts = None
+        
         if request.method == 'POST':
             try:
                 # Solo permitir editar campos que el cliente puede modificar
-                update_query = """
-                    UPDATE Clientes SET 
-                        direccion=%s, telefono=%s, correo_electronico=%s,
-                        ingresos_anuales=%s, gasto_mensual=%s, carga_familiar=%s
-                    WHERE id_cliente=%s
-                """
-                values = (
-                    request.form['direccion'].strip(),
-                    request.form['telefono'].strip(),
-                    request.form['correo_electronico'].strip(),
-                    float(request.form['ingresos_anuales']),
-                    float(request.form['gasto_mensual']),
-                    int(request.form['carga_familiar']),
-                    client_id
-                )
+                client_data = {
+                    'direccion': request.form['direccion'].strip(),
+                    'telefono': request.form['telefono'].strip(),
+                    'correo_electronico': request.form['correo_electronico'].strip(),
+                    'ingresos_anuales': float(request.form['ingresos_anuales']),
+                    'gasto_mensual': float(request.form['gasto_mensual']),
+                    'carga_familiar': int(request.form['carga_familiar'])
+                }
                 
-                result = crud.db.execute_query(update_query, values, fetch=False)
+                result = crud.update_client_limited(client_id, client_data, original=client,
+                                                    expected_version=request.form.get('version'))
                 
-                if result:
-                    logger.info(f"Cliente {client_id} actualizado exitosamente")
+                if result == CONFLICT:
+                    logger.warning("Conflicto de edición en cliente %s", client_id)
+                    client = crud.get_client_by_id(client_id) or client
+                    conflicts = changed_fields(client, client_data)
+                    flash('Sus datos fueron modificados mientras los editaba. '
+                          'Revise los valores actuales y vuelva a guardar.', 'error')
+                elif result:
+                    if result == UPDATED:
+                        logger.info("Cliente %s actualizado exitosamente", client_id)
                     flash('Información actualizada exitosamente', 'success')
                     return redirect('/client/dashboard')
                 else:
                     flash('Error al actualizar información', 'error')
                     
             except ValueError as ve:
-                logger.error(f"Error de validación: {ve}")
+                logger.error("Error de validación: %s", ve)
                 flash('Error: Verifique que los valores numéricos sean correctos', 'error')
             except Exception as e:
-                logger.error(f"Error updating client info: {e}")
+                logger.error("Error updating client info: %s", e)
                 flash('Error al procesar la solicitud', 'error')
         
-        return render_template('client_edit_limited.html', client=client)
+        return render_template('client_edit_limited.html', client=client, conflicts=conflicts)
         
     except Exception as e:
-        logger.error(f"Error en client_edit_own: {e}")
+        logger.error("Error en client_edit_own: %s", e)
         flash('Error accediendo a la información', 'error')
         return redirect('/client/dashboard')
 
@@ -243,25 +347,114 @@ def client_edit_own():
 @agent_required
 def client_list():
     try:
-        clients = crud.get_all_clients()
-        tipos_seguro = crud.get_tipos_seguro()
-        clasificaciones = crud.get_clasificaciones_sistema()
-        clasificaciones_agente = crud.get_clasificaciones_agente()
+        # Filtros y orden se aplican en el servidor; la paginación es por keyset
+        filters = {key: request.args.get(key, '').strip() for key in CLIENT_FILTER_COLUMNS}
+        sort = request.args.get('sort', 'id')
+        direction = request.args.get('dir', 'asc')
+        per_page = min(max(request.args.get('per_page', CLIENTS_PER_PAGE, type=int), 1), 200)
+        
+        after, before = request.args.get('after'), request.args.get('before')
+        
+        # La página y los catálogos son independientes: se consultan en paralelo
+        data = crud.db.gather({
+            'page': lambda: crud.get_clients_page(filters, sort, direction,
+                                                  after=after, before=before, limit=per_page),
+            **crud.catalog_calls()
+        })
+        page = data['page']
+        if page is None:
+            raise RuntimeError("no se pudo obtener la página de clientes")
+        
+        # Parámetros que se conservan al navegar entre páginas
+        nav_args = {key: value for key, value in filters.items() if value}
+        nav_args.update(sort=page['sort'], dir=page['direction'], per_page=per_page)
         
         return render_template('client_list.html', 
-                             clients=clients,
-                             tipos_seguro=tipos_seguro,
-                             clasificaciones=clasificaciones,
-                             clasificaciones_agente=clasificaciones_agente)
+                             clients=page['clients'],
+                             page=page,
+                             filters=filters,
+                             nav_args=nav_args,
+                             tipos_seguro=data['tipos_seguro'],
+                             clasificaciones=data['clasificaciones'],
+                             clasificaciones_agente=data['clasificaciones_agente'])
     except Exception as e:
-        logger.error(f"Error cargando lista de clientes: {e}")
+        logger.error("Error cargando lista de clientes: %s", e)
         flash('Error cargando los datos', 'error')
         return redirect('/agent/dashboard')
 
+# Acciones masivas de la lista de clientes: acción -> columna (None = eliminar)
+BULK_ACTIONS = {
+    'reclasificar': 'id_clasificacion_agente',
+    'tipo_seguro': 'id_tipo_seguro',
+    'eliminar': None,
+}
+
+@app.route('/agent/clients/bulk', methods=['POST'])
+@login_required
+@agent_required
+def bulk_clients():
+    """
+    Aplica una acción a varios clientes en una sola transacción. Acepta el formulario
+    de la lista (ids marcados, action, value) o JSON {"action", "ids", "value"}; en
+    ese caso responde el resultado por id.
+    """
+    payload = request.get_json(silent=True)
+    as_json = payload is not None
+    if as_json:
+        action, raw_ids, value = payload.get('action'), payload.get('ids') or [], payload.get('value')
+    else:
+        action, raw_ids, value = request.form.get('action'), request.form.getlist('ids'), request.form.get('value')
+    back = request.form.get('next', '')
+    if not back.startswith('/agent/clients'):
+        back = '/agent/clients'
+    
+    def fail(message, status=400):
+        if as_json:
+            return jsonify({'error': message}), status
+        flash(message, 'error')
+        return redirect(back)
+    
+    try:
+        ids = [int(value_id) for value_id in raw_ids]
+    except (TypeError, ValueError):
+        return fail('ids debe ser una lista de números')
+    if not ids:
+        return fail('Seleccione al menos un cliente')
+    if len(ids) > config.BULK_MAX_IDS:
+        return fail(f'Máximo {config.BULK_MAX_IDS} clientes por acción')
+    if action not in BULK_ACTIONS:
+        return fail('Acción no válida')
+    
+    field = BULK_ACTIONS[action]
+    if field:
+        catalog = crud.get_clasificaciones_agente() if field == 'id_clasificacion_agente' else crud.get_tipos_seguro()
+        if str(value) not in {str(row[field]) for row in catalog or ()}:
+            return fail('Valor no válido para la acción')
+    
+    try:
+        results = crud.bulk_update_clients(ids, field, value) if field else crud.bulk_delete_clients(ids)
+    except Exception as e:
+        logger.error("Error en acción masiva %s: %s", action, e)
+        return fail('Error aplicando la acción; no se modificó ningún cliente', 500)
+    
+    totals = Counter(results.values())
+    logger.info("Acción masiva %s sobre %s clientes: %s", action, len(results), dict(totals))
+    if as_json:
+        return jsonify({'action': action, 'totales': totals,
+                        'resultados': {str(client_id): outcome for client_id, outcome in results.items()}})
+    
+    flash('Acción aplicada: ' + ', '.join(f"{count} {outcome.replace('_', ' ')}"
+                                          for outcome, count in totals.items()), 'success')
+    missing = [str(client_id) for client_id, outcome in results.items() if outcome == BULK_NOT_FOUND]
+    if missing:
+        flash(f"Clientes no encontrados: {', '.join(missing)}", 'error')
+    return redirect(back)
+
 @app.route('/agent/client/new', methods=['GET', 'POST'])
 @login_required
 @agent_required
 def create_client():
+    conflicts = None
     if request.method == 'POST':
         try:
             client_data = {
@@ -278,7 +471,6 @@ def create_client():
                 'ingresos_anuales': request.form['ingresos_anuales'],
                 'gasto_mensual': request.form['gasto_mensual'],
                 'carga_familiar': request.form['carga_familiar'],
-                'id_clasificacion_sistema': request.form['id_clasificacion_sistema'],
                 'id_clasificacion_agente': request.form['id_clasificacion_agente']
             }
             
@@ -290,32 +482,87 @@ def create_client():
             
             result = crud.create_client(client_data)
             if result:
-                logger.info(f"Cliente creado exitosamente: {client_data['codigo_cliente']}")
+                logger.info("Cliente creado exitosamente: %s", client_data['codigo_cliente'])
                 flash('Cliente creado exitosamente', 'success')
                 return redirect('/agent/clients')
             else:
                 flash('Error al crear cliente', 'error')
                 
         except Exception as e:
-            logger.error(f"Error creating client: {e}")
+            logger.error("Error creating client: %s", e)
             flash('Error al procesar la solicitud', 'error')
     
     try:
-        tipos_seguro = crud.get_tipos_seguro()
-        clasificaciones = crud.get_clasificaciones_sistema()
-        clasificaciones_agente = crud.get_clasificaciones_agente()
-        usuarios = crud.get_all_users()
+        data = crud.db.gather({'usuarios': crud.get_all_users, **crud.catalog_calls()})
         
-        return render_template('client_form.html', 
-                             tipos_seguro=tipos_seguro,
-                             clasificaciones=clasificaciones,
-                             clasificaciones_agente=clasificaciones_agente,
-                             usuarios=usuarios)
+        return render_template('client_form.html', **data)
     except Exception as e:
-        logger.error(f"Error cargando formulario de cliente: {e}")
+        logger.error("Error cargando formulario de cliente: %s", e)
         flash('Error cargando el formulario', 'error')
         return redirect('/agent/clients')
 
+# Importación masiva de clientes desde CSV
+@app.route('/agent/clients/import', methods=['GET', 'POST'])
+@login_required
+@agent_required
+def import_clients():
+    summary = None
+    if request.method == 'POST':
+        upload = request.files.get('archivo')
+        if not upload or not upload.filename:
+            flash('Seleccione un archivo CSV', 'error')
+            return redirect('/agent/clients/import')
+        
+        try:
+            # Se lee el archivo como texto en streaming, sin cargarlo completo en memoria
+            stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+            summary = ClientImporter(crud=crud).run(stream)
+            if summary['reporte']:
+                summary['reporte'] = os.path.basename(summary['reporte'])
+            logger.info("Importación de clientes: %s insertados, %s errores", summary['insertados'], summary['errores'])
+            flash(f"Importación terminada: {summary['insertados']} clientes insertados, "
+                  f"{summary['errores']} con errores", 'success' if not summary['errores'] else 'error')
+        except (ValueError, UnicodeDecodeError) as e:
+            logger.error("Archivo de importación inválido: %s", e)
+            flash(f'Archivo inválido: {e}', 'error')
+        except Exception as e:
+            logger.error("Error importando clientes: %s", e)
+            flash('Error al procesar el archivo', 'error')
+    
+    return render_template('client_import.html', summary=summary)
+
+@app.route('/agent/clients/import/report/<name>')
+@login_required
+@agent_required
+def import_report(name):
+    expire_reports()
+    path = report_path(name)
+    if not path or not os.path.exists(path):
+        abort(404)
+    # el reporte es de un solo uso: se lee a memoria (solo trae las filas con error) y se borra
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        os.remove(path)
+    except FileNotFoundError:
+        abort(404)
+    return send_file(io.BytesIO(data), mimetype='text/csv', as_attachment=True, download_name=name)
+
+# Exportación de la cartera completa en streaming (CSV o NDJSON)
+@app.route('/agent/clients/export')
+@login_required
+@agent_required
+def export_clients():
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': 'Formato no soportado'}), 400
+    
+    generator, mimetype, extension = EXPORT_FORMATS[export_format]
+    logger.info("Exportación de clientes iniciada - formato %s", export_format)
+    return Response(stream_with_context(generator(crud.iter_all_clients(projection=EXPORT_PROJECTION))),
+                    mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename=clientes.{extension}'})
+
 @app.route('/agent/client/edit/<int:client_id>', methods=['GET', 'POST'])
 @login_required
 @agent_required
@@ -326,6 +573,7 @@ def edit_client(client_id):
         flash('Cliente no encontrado', 'error')
         return redirect('/agent/clients')
     
+    conflicts = None
     if request.method == 'POST':
         try:
             client_data = {
@@ -341,31 +589,38 @@ def edit_client(client_id):
                 'ingresos_anuales': request.form['ingresos_anuales'],
                 'gasto_mensual': request.form['gasto_mensual'],
                 'carga_familiar': request.form['carga_familiar'],
-                'id_clasificacion_sistema': request.form['id_clasificacion_sistema'],
                 'id_clasificacion_agente': request.form['id_clasificacion_agente']
             }
             
-            result = crud.update_client(client_id, client_data)
-            if result:
-                logger.info(f"Cliente {client_id} actualizado exitosamente")
+            # solo se escriben las columnas modificadas, si la fila sigue en la versión editada
+            result = crud.update_client(client_id, client_data, original=client,
+                                        expected_version=request.form.get('version'))
+            if result == CONFLICT:
+                logger.warning("Conflicto de edición en cliente %s", client_id)
+                client = crud.get_client_by_id(client_id)
+                if not client:
+                    flash('El cliente fue eliminado por otro usuario', 'error')
+                    return redirect('/agent/clients')
+                conflicts = changed_fields(client, client_data)
+                flash('Otro usuario modificó este cliente mientras usted lo editaba. '
+                      'Revise los valores actuales y vuelva a guardar.', 'error')
+            elif result == UNCHANGED:
+                flash('No hay cambios que guardar', 'success')
+                return redirect('/agent/clients')
+            elif result:
+                logger.info("Cliente %s actualizado exitosamente", client_id)
                 flash('Cliente actualizado exitosamente', 'success')
                 return redirect('/agent/clients')
             else:
                 flash('Error al actualizar cliente', 'error')
                 
         except Exception as e:
-            logger.error(f"Error updating client: {e}")
+            logger.error("Error updating client: %s", e)
             flash('Error al procesar la solicitud', 'error')
     
-    tipos_seguro = crud.get_tipos_seguro()
-    clasificaciones = crud.get_clasificaciones_sistema()
-    clasificaciones_agente = crud.get_clasificaciones_agente()
+    data = crud.db.gather(crud.catalog_calls())
     
-    return render_template('client_form.html', 
-                         client=client,
-                         tipos_seguro=tipos_seguro,
-                         clasificaciones=clasificaciones,
-                         clasificaciones_agente=clasificaciones_agente)
+    return render_template('client_form.html', client=client, conflicts=conflicts, **data)
 
 @app.route('/agent/client/delete/<int:client_id>', methods=['POST'])
 @login_required
@@ -374,12 +629,12 @@ def delete_client(client_id):
     try:
         result = crud.delete_client(client_id)
         if result:
-            logger.info(f"Cliente {client_id} eliminado exitosamente")
+            logger.info("Cliente %s eliminado exitosamente", client_id)
             flash('Cliente eliminado exitosamente', 'success')
         else:
             flash('Error al eliminar cliente', 'error')
     except Exception as e:
-        logger.error(f"Error deleting client: {e}")
+        logger.error("Error deleting client: %s", e)
         flash('Error al procesar la solicitud', 'error')
     
     return redirect('/agent/clients')
@@ -389,12 +644,20 @@ def delete_client(client_id):
 @login_required
 @agent_required
 def view_client(client_id):
+    if request.if_none_match:
+        version = crud.get_client_version(client_id)
+        if version is not None:
+            cached = not_modified(client_etag('view', client_id, version))
+            if cached:
+                return cached
+    
     client = crud.get_client_by_id(client_id)
     if not client:
         flash('Cliente no encontrado', 'error')
         return redirect('/agent/clients')
     
-    return render_template('client_view.html', client=client)
+    return with_etag(render_template('client_view.html', client=client),
+                     client_etag('view', client_id, client['version']))
 
 # Gestión de usuarios
 @app.route('/agent/users')
@@ -404,13 +667,52 @@ def user_list():
     users = crud.get_all_users()
     return render_template('user_list.html', users=users)
 
+# Búsqueda de clientes para el typeahead de la lista
+@app.route('/api/clients/search')
+@login_required
+@agent_required
+def search_clients_api():
+    text = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', config.SEARCH_RESULTS_LIMIT, type=int), 1), 50)
+    if len(text) < 2:
+        return jsonify([])
+    return jsonify(crud.search_clients(text, limit))
+
+# API de consulta masiva: /api/clients?ids=1,2,3&fields=nombre,rut
+# Solo agentes: devuelve datos personales y económicos de cualquier cliente
+@app.route('/api/clients')
+@login_required
+@agent_required
+def get_clients_api():
+    try:
+        ids = [int(value) for value in request.args.get('ids', '').split(',') if value.strip()]
+    except ValueError:
+        return jsonify({'error': 'ids debe ser una lista de números separados por coma'}), 400
+    if not ids:
+        return jsonify({'error': 'Debe indicar ids'}), 400
+    if len(ids) > config.API_MAX_IDS:
+        return jsonify({'error': f'Máximo {config.API_MAX_IDS} ids por consulta'}), 400
+    
+    fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()] or None
+    result = crud.get_clients_by_ids(ids, fields)
+    if result is None:
+        return jsonify({'error': 'Error consultando clientes'}), 500
+    return jsonify(result)
+
 # API para obtener datos
 @app.route('/api/client/<int:client_id>')
 @login_required
 def get_client_api(client_id):
-    client = crud.get_client_by_id(client_id)
+    if request.if_none_match:
+        version = crud.get_client_version(client_id)
+        if version is not None:
+            cached = not_modified(client_etag('api', client_id, version))
+            if cached:
+                return cached
+    
+    client = crud.get_client_by_id(client_id, 'api')
     if client:
-        return jsonify(client)
+        return with_etag(jsonify(client), client_etag('api', client_id, client['version']))
     return jsonify({'error': 'Cliente no encontrado'}), 404
 
 if __name__ == '__main__':
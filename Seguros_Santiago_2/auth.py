@@ -1,14 +1,28 @@
 import re
 import logging
+import threading
 from database import Database
+from passwords import PasswordBusyError, default_verifier, dummy_hash, needs_rehash
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Usuario con su rol y cliente asociado, buscado por una columna con índice único
+LOGIN_QUERY = """
+    SELECT u.id_usuario, u.nombre_usuario, u.correo_electronico, 
+           u.password, u.id_rol, r.nombre_rol, c.id_cliente 
+    FROM Usuarios u 
+    JOIN Roles r ON u.id_rol = r.id_rol 
+    LEFT JOIN Clientes c ON c.id_usuario = u.id_usuario 
+    WHERE u.{column} = %s
+    LIMIT 1
+"""
+
 class AuthSystem:
     def __init__(self):
         self.db = Database()
+        self._role_cache = {}  # id_usuario -> id_rol
+        self._role_lock = threading.Lock()
+        self.verifier = default_verifier()
     
     def validate_password(self, password):
         """Valida que la contraseña cumpla con los requisitos"""
@@ -24,56 +38,88 @@ class AuthSystem:
         return True, "Contraseña válida"
     
     def login(self, username, password):
-        """Autentica un usuario con username/email y contraseña"""
+        """
+        Autentica un usuario con username/email y contraseña.
+        Lanza PasswordBusyError si el pool de verificación está saturado.
+        Cada intento deja un único evento 'login' con su resultado.
+        """
+        event = {'event': 'login', 'username': username, 'resultado': 'usuario_no_encontrado'}
+        level = logging.WARNING
         try:
-            # Consulta mejorada con logging
-            query = """
-                SELECT u.id_usuario, u.nombre_usuario, u.correo_electronico, 
-                       u.password, u.id_rol, r.nombre_rol 
-                FROM Usuarios u 
-                JOIN Roles r ON u.id_rol = r.id_rol 
-                WHERE u.nombre_usuario = %s OR u.correo_electronico = %s
-            """
-            
-            logger.info(f"Intentando autenticar usuario: {username}")
-            
-            # Ejecutar consulta
-            users = self.db.execute_query(query, (username, username))
-            
-            # Debug: mostrar todos los usuarios encontrados
-            logger.info(f"Usuarios encontrados: {len(users) if users else 0}")
+            # Dos búsquedas puntuales por índice único en vez de un OR entre columnas:
+            # primero por nombre de usuario y, si parece un email, por correo
+            users = self.db.execute_query(LOGIN_QUERY.format(column='nombre_usuario'), (username,))
+            if not users and '@' in username:
+                users = self.db.execute_query(LOGIN_QUERY.format(column='correo_electronico'), (username,))
             
             if users and len(users) > 0:
                 user = users[0]
-                logger.info(f"Usuario encontrado: {user['nombre_usuario']}, Rol: {user['nombre_rol']}")
-                logger.info(f"Contraseña almacenada: {user['password']}")
-                logger.info(f"Contraseña ingresada: {password}")
+                event['user_id'] = user['id_usuario']
                 
-                # Verificar contraseña (comparación directa por ahora)
-                if user['password'] == password:
-                    logger.info(f"Login exitoso para usuario: {user['nombre_usuario']}")
+                # Verificar contraseña en el pool de hashing
+                if self.verifier.verify(password, user['password']):
+                    event.update(resultado='exitoso', rol=user['nombre_rol'])
+                    level = logging.INFO
+                    if needs_rehash(user['password']):
+                        event['rehash'] = self._rehash(user['id_usuario'], password)
+                    with self._role_lock:
+                        self._role_cache[user['id_usuario']] = user['id_rol']
                     return user
                 else:
-                    logger.warning(f"Contraseña incorrecta para usuario: {username}")
+                    event['resultado'] = 'password_incorrecta'
             else:
-                logger.warning(f"Usuario no encontrado: {username}")
+                # mismo costo que una contraseña incorrecta: el tiempo no delata si el usuario existe
+                self.verifier.verify(password, dummy_hash())
             
             return None
             
+        except PasswordBusyError:
+            event['resultado'] = 'ocupado'
+            raise
         except Exception as e:
-            logger.error(f"Error en login: {e}")
+            event.update(resultado='error', error=str(e))
+            level = logging.ERROR
             return None
+        finally:
+            logger.log(level, "login %s: %s", event['resultado'], username, extra={'fields': event})
+    
+    def _rehash(self, user_id, password):
+        """
+        Reemplaza una contraseña en texto plano o con costo antiguo por su hash actual.
+        :return: 'hecho' | 'pospuesto' si el pool de hashing está saturado | 'fallido' si no se pudo guardar
+        """
+        try:
+            hashed = self.verifier.hash(password)
+            if not self.db.execute_query("UPDATE Usuarios SET password = %s WHERE id_usuario = %s",
+                                         (hashed, user_id), fetch=False):
+                logger.warning("⚠️ No se pudo guardar el rehash de la contraseña del usuario %s", user_id)
+                return 'fallido'
+            return 'hecho'
+        except PasswordBusyError:
+            return 'pospuesto'
     
     def get_user_role(self, user_id):
-        """Obtiene el rol de un usuario por ID"""
+        """Obtiene el rol de un usuario por ID (resuelto en el login y guardado en caché)"""
+        with self._role_lock:
+            if user_id in self._role_cache:
+                return self._role_cache[user_id]
         try:
             query = "SELECT id_rol FROM Usuarios WHERE id_usuario = %s"
             result = self.db.execute_query(query, (user_id,))
-            return result[0]['id_rol'] if result and len(result) > 0 else None
+            role = result[0]['id_rol'] if result and len(result) > 0 else None
+            if role is not None:
+                with self._role_lock:
+                    self._role_cache[user_id] = role
+            return role
         except Exception as e:
-            logger.error(f"Error obteniendo rol de usuario: {e}")
+            logger.error("Error obteniendo rol de usuario: %s", e)
             return None
     
+    def invalidate_user(self, user_id):
+        """Descartar el rol en caché de un usuario cuando cambia su rol"""
+        with self._role_lock:
+            self._role_cache.pop(user_id, None)
+    
     def get_all_users_debug(self):
         """Método de debug para ver todos los usuarios"""
         try:
@@ -86,15 +132,11 @@ class AuthSystem:
             """
             users = self.db.execute_query(query)
             
-            logger.info("=== DEBUG: Todos los usuarios en la base de datos ===")
-            for user in users:
-                logger.info(f"ID: {user['id_usuario']}, Usuario: {user['nombre_usuario']}, "
-                          f"Email: {user['correo_electronico']}, Password: {user['password']}, "
-                          f"Rol: {user['nombre_rol']}")
-            logger.info("=== FIN DEBUG ===")
+            # no se loguean los registros: incluyen el hash de la contraseña
+            logger.debug("Debug de usuarios: %d usuarios", len(users or ()))
             
             return users
             
         except Exception as e:
-            logger.error(f"Error en debug de usuarios: {e}")
+            logger.error("Error en debug de usuarios: %s", e)
             return []
\ No newline at end of file
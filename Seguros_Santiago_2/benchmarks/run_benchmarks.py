@@ -0,0 +1,199 @@
+"""
+Micro-benchmarks de la capa de datos y de autenticación, sin servidor MySQL.
+
+Se ejecutan contra una base SQLite sembrada con datos sintéticos (benchmarks/standin.py)
+usando el mismo Database/ConnectionPool de la aplicación. Los resultados se escriben
+en JSON para comparar entre commits:
+
+    python -m benchmarks.run_benchmarks --output bench.json
+    python -m benchmarks.run_benchmarks --sizes 1000,100000 --compare bench.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import config
+import database
+from benchmarks import standin
+
+
+def measure(fn, repeat, warmup=1):
+    """Ejecuta `fn` `repeat` veces y devuelve las estadísticas de los tiempos (segundos)"""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        'runs': repeat,
+        'min': timings[0],
+        'median': statistics.median(timings),
+        'mean': statistics.fmean(timings),
+        'p95': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+
+
+def repeat_for(size, base):
+    """Menos repeticiones a medida que crece la tabla"""
+    return max(3, base * 1000 // max(size, 1000))
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def install_pool(path):
+    """Apunta el pool compartido de Database a la base SQLite"""
+    database.set_pool(database.ConnectionPool(
+        {'path': path},
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_POOL_MAX_OVERFLOW,
+        recycle=config.DB_POOL_RECYCLE,
+        timeout=config.DB_POOL_TIMEOUT,
+        connect=standin.connect
+    ))
+
+
+def bench_size_independent(path, results):
+    from auth import AuthSystem
+
+    db = database.Database()
+    results.append(dict(name='execute_query.select_1', params={}, **measure(
+        lambda: db.execute_query("SELECT 1"), repeat=2000)))
+
+    raw = standin.connect(path)
+    def raw_select():
+        cursor = raw.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchall()
+        cursor.close()
+    results.append(dict(name='raw_cursor.select_1', params={}, **measure(raw_select, repeat=2000)))
+    raw.close()
+
+    auth = AuthSystem()
+    results.append(dict(name='auth.login', params={'resultado': 'ok'}, **measure(
+        lambda: auth.login('usuario1', standin.BENCH_PASSWORD), repeat=500)))
+    results.append(dict(name='auth.login', params={'resultado': 'clave_incorrecta'}, **measure(
+        lambda: auth.login('usuario1', 'Incorrecta$1'), repeat=500)))
+    results.append(dict(name='auth.validate_password', params={}, **measure(
+        lambda: auth.validate_password(standin.BENCH_PASSWORD), repeat=20000)))
+
+
+def bench_size(path, size, results):
+    from crud_model import CRUDModel, CLIENT_SELECT
+
+    crud = CRUDModel()
+    rng = random.Random(size)
+    params = {'clientes': size}
+
+    results.append(dict(name='crud.get_all_clients', params=params, **measure(
+        crud.get_all_clients, repeat=repeat_for(size, 20))))
+    results.append(dict(name='crud.get_all_clients.dict', params=params, **measure(
+        lambda: crud.get_all_clients(compact=False), repeat=repeat_for(size, 20))))
+    results.append(dict(name='crud.get_client_by_id', params=params, **measure(
+        lambda: crud.get_client_by_id(rng.randint(1, size)), repeat=1000)))
+    for projection in ('list', 'api'):
+        results.append(dict(name=f'crud.get_clients_page.{projection}', params=params, **measure(
+            lambda: crud.get_clients_page(sort='apellido', limit=200, projection=projection), repeat=200)))
+
+    # materialización fila -> dict sobre el mismo resultado ya leído como tuplas
+    raw = standin.connect(path)
+    cursor = raw.cursor()
+    cursor.execute(CLIENT_SELECT)
+    columns = cursor.column_names
+    rows = cursor.fetchall()
+    cursor.close()
+    raw.close()
+    results.append(dict(name='rows.to_dict', params=params, **measure(
+        lambda: [dict(zip(columns, row)) for row in rows], repeat=repeat_for(size, 20))))
+    results.append(dict(name='rows.tuples', params=params, **measure(
+        lambda: [tuple(row) for row in rows], repeat=repeat_for(size, 20))))
+    results.append(dict(name='rows.compact', params=params, **measure(
+        lambda: database.compact_rows(columns, rows), repeat=repeat_for(size, 20))))
+
+
+def compare(results, baseline_path, max_regression):
+    """Compara medianas contra un JSON anterior; devuelve False si alguna empeora más del umbral"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {(r['name'], json.dumps(r['params'], sort_keys=True)): r for r in baseline['results']}
+    ok = True
+    print(f"{'benchmark':45} {'antes':>12} {'ahora':>12} {'ratio':>7}", file=sys.stderr)
+    for r in results:
+        key = (r['name'], json.dumps(r['params'], sort_keys=True))
+        if key not in previous:
+            continue
+        before, now = previous[key]['median'], r['median']
+        ratio = now / before if before else float('inf')
+        flag = '  <-- regresión' if ratio > max_regression else ''
+        ok = ok and not flag
+        label = r['name'] + (' ' + ','.join(f'{k}={v}' for k, v in r['params'].items()) if r['params'] else '')
+        print(f"{label:45} {before * 1e3:10.3f}ms {now * 1e3:10.3f}ms {ratio:7.2f}{flag}", file=sys.stderr)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de la capa de datos y autenticación")
+    parser.add_argument('--sizes', default='1000,100000,1000000', help="cantidades de clientes a sembrar")
+    parser.add_argument('--output', help="archivo JSON de resultados (por defecto stdout)")
+    parser.add_argument('--compare', help="JSON de una ejecución anterior para comparar")
+    parser.add_argument('--max-regression', type=float, default=1.2,
+                        help="ratio de medianas a partir del cual se considera regresión")
+    parser.add_argument('--hash-iterations', type=int, default=1000,
+                        help="costo PBKDF2 de los logins medidos (el de producción haría eterna la corrida)")
+    args = parser.parse_args()
+
+    # el log de la aplicación (incluidos los WARNING de cada login fallido) ensucia la salida
+    # y domina los tiempos; los errores se siguen mostrando
+    logging.disable(logging.WARNING)
+    config.PASSWORD_HASH_ITERATIONS = args.hash_iterations
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for index, size in enumerate(sizes):
+            path = os.path.join(tmp, f'bench_{size}.sqlite')
+            print(f"Sembrando {size} clientes...", file=sys.stderr)
+            standin.seed(path, size)
+            install_pool(path)
+            if index == 0:
+                bench_size_independent(path, results)
+            bench_size(path, size, results)
+            database.get_pool().close_all()
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'hash_iterations': args.hash_iterations,
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare and not compare(results, args.compare, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
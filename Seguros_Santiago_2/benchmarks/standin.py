@@ -0,0 +1,176 @@
+"""
+Base de datos de reemplazo para benchmarks: SQLite con el esquema de
+seguros_santiago_2, detrás de una conexión que imita la API de mysql.connector
+que usa Database (cursor dictionary/buffered/prepared, %s, start_transaction...).
+"""
+import random
+import re
+import sqlite3
+from decimal import Decimal
+
+SCHEMA = """
+CREATE TABLE Roles (id_rol INTEGER PRIMARY KEY, nombre_rol TEXT NOT NULL);
+CREATE TABLE Usuarios (
+    id_usuario INTEGER PRIMARY KEY, codigo_usuario TEXT, nombre_usuario TEXT NOT NULL,
+    correo_electronico TEXT NOT NULL, password TEXT NOT NULL, id_rol INTEGER NOT NULL,
+    fecha_creacion TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE UNIQUE INDEX ux_usuarios_nombre ON Usuarios (nombre_usuario);
+CREATE UNIQUE INDEX ux_usuarios_correo ON Usuarios (correo_electronico);
+CREATE TABLE Tipos_Seguros (id_tipo_seguro INTEGER PRIMARY KEY, nombre_tipo_seguro TEXT NOT NULL);
+CREATE TABLE Clasificaciones_Sistema (id_clasificacion_sistema INTEGER PRIMARY KEY, nombre TEXT NOT NULL);
+CREATE TABLE Clasificaciones_Agente (id_clasificacion_agente INTEGER PRIMARY KEY, nombre TEXT NOT NULL);
+CREATE TABLE Agentes (id_agente INTEGER PRIMARY KEY, id_usuario INTEGER NOT NULL);
+CREATE TABLE Clientes (
+    id_cliente INTEGER PRIMARY KEY, codigo_cliente TEXT NOT NULL, id_usuario INTEGER,
+    rut TEXT NOT NULL, nombre TEXT NOT NULL, apellido TEXT NOT NULL, direccion TEXT,
+    telefono TEXT, correo_electronico TEXT, genero TEXT, id_tipo_seguro INTEGER,
+    ingresos_anuales REAL, gasto_mensual REAL, carga_familiar INTEGER,
+    id_clasificacion_sistema INTEGER, id_clasificacion_agente INTEGER,
+    version INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE Estadisticas_Cartera (
+    dimension TEXT NOT NULL, clave TEXT NOT NULL, clientes INTEGER NOT NULL DEFAULT 0,
+    carga_familiar INTEGER NOT NULL DEFAULT 0, ingresos_anuales REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, clave)
+);
+CREATE INDEX ix_clientes_usuario ON Clientes (id_usuario);
+CREATE INDEX ix_clientes_codigo_cliente_id ON Clientes (codigo_cliente, id_cliente);
+CREATE INDEX ix_clientes_nombre_id ON Clientes (nombre, id_cliente);
+CREATE INDEX ix_clientes_apellido_id ON Clientes (apellido, id_cliente);
+CREATE INDEX ix_clientes_rut_id ON Clientes (rut, id_cliente);
+"""
+
+NOMBRES = ['Ana', 'Benjamín', 'Camila', 'Diego', 'Fernanda', 'Ignacio', 'Javiera', 'Matías', 'Sofía', 'Tomás']
+APELLIDOS = ['González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva', 'Martínez', 'Sepúlveda']
+
+# contraseña válida según AuthSystem.validate_password
+BENCH_PASSWORD = 'Clave$Segura1'
+
+
+sqlite3.register_adapter(Decimal, float)
+
+# ON DUPLICATE KEY UPDATE de MySQL -> upsert de SQLite
+ON_DUPLICATE_KEY = re.compile(r'ON DUPLICATE KEY UPDATE')
+VALUES_FUNCTION = re.compile(r'VALUES\((\w+)\)')
+
+
+class StandInCursor:
+    """Cursor SQLite con la interfaz de los cursores de mysql.connector usada por Database"""
+
+    def __init__(self, connection, dictionary=False):
+        self._connection = connection
+        self._cursor = connection.raw.cursor()
+        self.dictionary = dictionary
+
+    @staticmethod
+    def _sql(query):
+        # SQLite serializa las escrituras por base: FOR UPDATE no hace falta (ni existe)
+        query = query.replace('%s', '?').replace(' FOR UPDATE', '')
+        if ON_DUPLICATE_KEY.search(query):
+            query = VALUES_FUNCTION.sub(r'excluded.\1', ON_DUPLICATE_KEY.sub('ON CONFLICT DO UPDATE SET', query))
+        return query
+
+    @property
+    def column_names(self):
+        return tuple(d[0] for d in self._cursor.description or ())
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def _convert(self, rows):
+        if not self.dictionary:
+            return rows
+        columns = self.column_names
+        return [dict(zip(columns, row)) for row in rows]
+
+    def execute(self, query, params=()):
+        self._cursor.execute(self._sql(query), tuple(params))
+
+    def executemany(self, query, seq_params):
+        self._cursor.executemany(self._sql(query), [tuple(p) for p in seq_params])
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return self._convert([row])[0] if row is not None else None
+
+    def fetchall(self):
+        return self._convert(self._cursor.fetchall())
+
+    def fetchmany(self, size):
+        return self._convert(self._cursor.fetchmany(size))
+
+    def close(self):
+        self._cursor.close()
+
+
+class StandInConnection:
+    """Conexión SQLite con la interfaz de MySQLConnection usada por Database"""
+
+    def __init__(self, path):
+        self.raw = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+
+    def cursor(self, dictionary=False, buffered=False, prepared=False):
+        return StandInCursor(self, dictionary=dictionary)
+
+    def start_transaction(self):
+        self.raw.execute('BEGIN')
+
+    def commit(self):
+        self.raw.execute('COMMIT')
+
+    def rollback(self):
+        if self.raw.in_transaction:
+            self.raw.execute('ROLLBACK')
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self.raw.close()
+
+
+def connect(path, **_):
+    """Fábrica para ConnectionPool(connect=...)"""
+    return StandInConnection(path)
+
+
+def seed(path, clients, users=None, seed_value=42):
+    """Crea el esquema en `path` y lo llena con `clients` clientes sintéticos"""
+    rng = random.Random(seed_value)
+    users = users or min(clients, 10000)
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    db.executemany("INSERT INTO Roles VALUES (?, ?)", [(1, 'Agente'), (2, 'Cliente')])
+    db.executemany("INSERT INTO Tipos_Seguros VALUES (?, ?)",
+                   [(1, 'Vida'), (2, 'Salud'), (3, 'Automotriz'), (4, 'Hogar')])
+    db.executemany("INSERT INTO Clasificaciones_Sistema VALUES (?, ?)", [(1, 'Premium'), (2, 'Estándar'), (3, 'Básico')])
+    db.executemany("INSERT INTO Clasificaciones_Agente VALUES (?, ?)", [(1, 'Preferente'), (2, 'Regular'), (3, 'Riesgo')])
+    db.executemany(
+        "INSERT INTO Usuarios (id_usuario, codigo_usuario, nombre_usuario, correo_electronico, password, id_rol) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        ((i, f'U{i:07d}', f'usuario{i}', f'usuario{i}@example.cl', BENCH_PASSWORD, 1 if i % 50 == 0 else 2)
+         for i in range(1, users + 1))
+    )
+
+    def client_rows():
+        for i in range(1, clients + 1):
+            ingresos = rng.randint(4, 80) * 1000000
+            yield (
+                i, f'C{i:08d}', (i - 1) % users + 1, f'{rng.randint(5000000, 25000000)}-{rng.randint(0, 9)}',
+                rng.choice(NOMBRES), rng.choice(APELLIDOS), f'Calle {rng.randint(1, 9999)}, Santiago',
+                f'+569{rng.randint(10000000, 99999999)}', f'cliente{i}@example.cl',
+                rng.choice(['Masculino', 'Femenino', 'Otro']), rng.randint(1, 4),
+                ingresos, round(ingresos / 12 * rng.uniform(0.2, 1.1)), rng.randint(0, 5),
+                rng.randint(1, 3), rng.randint(1, 3), 1
+            )
+
+    db.executemany("INSERT INTO Clientes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", client_rows())
+    db.commit()
+    db.close()
+    return users
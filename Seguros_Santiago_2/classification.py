@@ -0,0 +1,160 @@
+import argparse
+import logging
+
+import numpy as np
+
+import config
+from database import Database
+from portfolio_stats import STATS_FIELDS, StatsDelta
+
+logger = logging.getLogger(__name__)
+
+# Métricas sobre las que se pueden escribir reglas
+METRICS = ('ingresos_anuales', 'gasto_mensual', 'carga_familiar', 'ratio_gasto', 'ingreso_per_capita')
+
+# Columnas de Clientes que se leen para clasificar
+INPUT_FIELDS = ('ingresos_anuales', 'gasto_mensual', 'carga_familiar', 'id_clasificacion_sistema')
+
+
+def compute_metrics(ingresos, gasto, carga):
+    """Columnas base y derivadas como arreglos float (NaN donde falta el dato)"""
+    ingresos = np.asarray(ingresos, dtype=float)
+    gasto = np.asarray(gasto, dtype=float)
+    carga = np.asarray(carga, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio_gasto = np.where(ingresos > 0, gasto * 12 / ingresos, np.inf)
+        ingreso_per_capita = ingresos / (1 + carga)
+    return {
+        'ingresos_anuales': ingresos,
+        'gasto_mensual': gasto,
+        'carga_familiar': carga,
+        'ratio_gasto': ratio_gasto,
+        'ingreso_per_capita': ingreso_per_capita,
+    }
+
+
+class ClassificationEngine:
+    """
+    Calcula id_clasificacion_sistema a partir de ingresos, gasto y carga familiar.
+    Las reglas se evalúan en orden sobre columnas completas; gana la primera que
+    se cumple y, si ninguna aplica, se usa la clasificación por defecto.
+    """
+
+    def __init__(self, rules=None, default=None):
+        self.rules = rules if rules is not None else config.CLASSIFICATION_RULES
+        self.default = default if default is not None else config.CLASSIFICATION_DEFAULT
+        for rule in self.rules:
+            unknown = set(rule['when']) - set(METRICS)
+            if unknown:
+                raise ValueError(f"Métricas desconocidas en regla {rule['id']}: {', '.join(sorted(unknown))}")
+
+    def classify_arrays(self, ingresos, gasto, carga):
+        """Clasificación vectorizada; devuelve un arreglo de ids del mismo largo"""
+        metrics = compute_metrics(ingresos, gasto, carga)
+        size = len(metrics['ingresos_anuales'])
+        conditions = []
+        for rule in self.rules:
+            mask = np.ones(size, dtype=bool)
+            for metric, (low, high) in rule['when'].items():
+                values = metrics[metric]
+                if low is not None:
+                    mask &= values >= low
+                if high is not None:
+                    mask &= values < high
+            conditions.append(mask)
+        choices = [rule['id'] for rule in self.rules]
+        return np.select(conditions, choices, default=self.default)
+
+    def classify(self, client_data):
+        """Ruta para un solo cliente (create_client / update_client)"""
+        def number(field):
+            value = client_data.get(field)
+            return np.nan if value in (None, '') else float(value)
+
+        result = self.classify_arrays([number('ingresos_anuales')],
+                                      [number('gasto_mensual')],
+                                      [number('carga_familiar')])
+        return int(result[0])
+
+    def _classify_rows(self, rows):
+        """(ids, clasificación guardada, clasificación calculada) de un lote de filas de Clientes"""
+        ids = np.fromiter((row['id_cliente'] for row in rows), dtype=np.int64, count=len(rows))
+        current = np.array([row['id_clasificacion_sistema'] if row['id_clasificacion_sistema'] is not None else -1
+                            for row in rows], dtype=np.int64)
+        new = self.classify_arrays(
+            [row['ingresos_anuales'] if row['ingresos_anuales'] is not None else np.nan for row in rows],
+            [row['gasto_mensual'] if row['gasto_mensual'] is not None else np.nan for row in rows],
+            [row['carga_familiar'] if row['carga_familiar'] is not None else np.nan for row in rows]
+        )
+        return ids, current, new
+
+    def recompute_all(self, db=None, batch_size=None, dry_run=False):
+        """
+        Recalcula la clasificación de toda la cartera y escribe solo las filas que cambian,
+        con un UPDATE ... WHERE id_cliente IN (...) por clasificación y lote. La lectura en
+        streaming solo elige candidatos: cada lote se vuelve a leer con FOR UPDATE y se
+        clasifica desde las filas bloqueadas, para no pisar un update_client concurrente.
+        :return: dict con total y cambiados
+        """
+        db = db or Database()
+        batch_size = batch_size or config.CLASSIFICATION_BATCH_SIZE
+        query = f"SELECT id_cliente, {', '.join(INPUT_FIELDS)} FROM Clientes"
+        locked_fields = ', '.join(('id_cliente',) + tuple(dict.fromkeys(INPUT_FIELDS + STATS_FIELDS)))
+        summary = {'total': 0, 'cambiados': 0}
+        pending = []  # id_cliente candidatos a la espera de escribirse
+
+        def flush():
+            if not pending:
+                return
+            delta = StatsDelta()
+            placeholders = ', '.join(['%s'] * len(pending))
+            with db.transaction() as cursor:
+                cursor.execute(
+                    f"SELECT {locked_fields} FROM Clientes WHERE id_cliente IN ({placeholders}) FOR UPDATE",
+                    tuple(pending)
+                )
+                locked = cursor.fetchall()
+                if locked:
+                    ids, current, new = self._classify_rows(locked)
+                    changed = new != current
+                    summary['cambiados'] += int(changed.sum())
+                    for row, is_changed, new_id in zip(locked, changed, new):
+                        if is_changed:
+                            delta.move(row, dict(row, id_clasificacion_sistema=int(new_id)))
+                    changed_ids, changed_new = ids[changed], new[changed]
+                    for new_id in np.unique(changed_new):
+                        client_ids = [int(i) for i in changed_ids[changed_new == new_id]]
+                        cursor.execute(
+                            f"UPDATE Clientes SET id_clasificacion_sistema = %s, version = version + 1 "
+                            f"WHERE id_cliente IN ({', '.join(['%s'] * len(client_ids))})",
+                            (int(new_id), *client_ids)
+                        )
+                    delta.apply(cursor)
+            pending.clear()
+
+        for rows in db.stream_query(query, batch_size=batch_size, compact=True):
+            ids, current, new = self._classify_rows(rows)
+            changed = new != current
+            summary['total'] += len(rows)
+            if dry_run:
+                summary['cambiados'] += int(changed.sum())
+                continue
+            pending.extend(int(i) for i in ids[changed])
+            if len(pending) >= batch_size:
+                flush()
+        if not dry_run:
+            flush()
+
+        logger.info("Clasificación recalculada - %s de %s clientes cambiaron", summary['cambiados'], summary['total'])
+        return summary
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Recalcular id_clasificacion_sistema de toda la cartera")
+    parser.add_argument('--batch-size', type=int, default=config.CLASSIFICATION_BATCH_SIZE,
+                        help="filas leídas y actualizadas por lote")
+    parser.add_argument('--dry-run', action='store_true', help="solo contar los cambios, sin escribir")
+    args = parser.parse_args()
+
+    result = ClassificationEngine().recompute_all(batch_size=args.batch_size, dry_run=args.dry_run)
+    print(f"Clientes: {result['total']}  Cambiados: {result['cambiados']}")
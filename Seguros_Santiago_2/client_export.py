@@ -0,0 +1,51 @@
+import csv
+import io
+import json
+from operator import itemgetter
+
+from crud_model import PROJECTIONS
+from database import Record
+
+# Proyección que se exporta y columnas del CSV, en el orden del SELECT
+EXPORT_PROJECTION = 'api'
+EXPORT_COLUMNS = PROJECTIONS[EXPORT_PROJECTION]
+
+
+def _json_default(value):
+    # Record de las filas compactas; str para Decimal y fechas que vienen de MySQL
+    if isinstance(value, Record):
+        return value.to_dict()
+    return str(value)
+
+
+def export_csv(batches, columns=EXPORT_COLUMNS):
+    """
+    Genera el CSV por trozos, uno por lote de filas (dict o Record), sin acumular el resultado.
+    La cabecera sale de `columns` antes de leer filas, así que un resultado vacío igual la tiene.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate(0)
+
+    values = itemgetter(*columns)
+    for rows in batches:
+        writer.writerows(values(row) for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+
+def export_ndjson(batches):
+    """Genera un objeto JSON por línea (NDJSON), un trozo por lote de filas"""
+    for rows in batches:
+        yield ''.join(json.dumps(row, default=_json_default, ensure_ascii=False) + '\n' for row in rows)
+
+
+# formato -> (generador, mimetype, extensión)
+EXPORT_FORMATS = {
+    'csv': (export_csv, 'text/csv', 'csv'),
+    'ndjson': (export_ndjson, 'application/x-ndjson', 'ndjson'),
+}
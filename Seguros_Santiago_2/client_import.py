@@ -0,0 +1,191 @@
+import argparse
+import csv
+import logging
+import os
+import re
+import time
+import uuid
+
+import config
+from crud_model import CRUDModel, CLIENT_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Conversión de las columnas numéricas; el resto se importa como texto
+NUMERIC_FIELDS = {
+    'id_usuario': int,
+    'id_tipo_seguro': int,
+    'ingresos_anuales': float,
+    'gasto_mensual': float,
+    'carga_familiar': int,
+    'id_clasificacion_sistema': int,
+    'id_clasificacion_agente': int,
+}
+
+# Columna que calcula el motor de clasificación en vez de leerse del archivo
+COMPUTED_FIELD = 'id_clasificacion_sistema'
+COMPUTED_INDEX = CLIENT_FIELDS.index(COMPUTED_FIELD)
+
+REPORT_FIELDS = ['linea', 'codigo_cliente', 'error']
+REPORT_NAME_PATTERN = re.compile(r'^import_errores_[0-9a-f]{32}\.csv$')
+
+
+def validate_row(row):
+    """
+    Valida una fila del CSV con los mismos campos requeridos que create_client
+    (id_clasificacion_sistema no se lee: lo calcula el motor de clasificación).
+    :return: (tupla de valores en orden de CLIENT_FIELDS, None) | (None, mensaje de error)
+    """
+    values = []
+    for field in CLIENT_FIELDS:
+        if field == COMPUTED_FIELD:
+            values.append(None)  # se completa por lote en ClientImporter
+            continue
+        value = (row.get(field) or '').strip()
+        if not value:
+            return None, f"El campo {field} es requerido"
+        if field in NUMERIC_FIELDS:
+            try:
+                value = NUMERIC_FIELDS[field](value)
+            except ValueError:
+                return None, f"El campo {field} debe ser numérico"
+        values.append(value)
+    return tuple(values), None
+
+
+def report_path(name):
+    """Ruta de un reporte de errores; None si el nombre no es uno generado por el importador"""
+    if not REPORT_NAME_PATTERN.match(name):
+        return None
+    return os.path.join(config.IMPORT_REPORT_DIR, name)
+
+
+def expire_reports(directory=None, ttl=None):
+    """
+    Borrar los reportes de errores más antiguos que `ttl` segundos (los descargados ya
+    se borran al entregarse; esto limpia los que nadie descargó).
+    :return: cantidad de reportes borrados
+    """
+    directory = directory or config.IMPORT_REPORT_DIR
+    ttl = config.IMPORT_REPORT_TTL if ttl is None else ttl
+    cutoff = time.time() - ttl
+    removed = 0
+    for name in os.listdir(directory):
+        if not REPORT_NAME_PATTERN.match(name):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            pass  # otro proceso lo borró entre medio
+    if removed:
+        logger.info("Reportes de importación vencidos borrados: %s", removed)
+    return removed
+
+
+class ClientImporter:
+    """
+    Importa clientes desde un CSV leyendo fila a fila, insertando en lotes de
+    `batch_size` filas por transacción. Las filas inválidas o rechazadas por la
+    base de datos se escriben en un reporte CSV en disco.
+    """
+
+    def __init__(self, crud=None, batch_size=None, report_file=None):
+        self.crud = crud or CRUDModel()
+        self.batch_size = batch_size or config.IMPORT_BATCH_SIZE
+        self.report_file = report_file
+        self._report = None
+        self._report_writer = None
+
+    def _report_error(self, line, codigo, error):
+        if self._report_writer is None:
+            if self.report_file is None:
+                expire_reports()
+                name = f"import_errores_{uuid.uuid4().hex}.csv"
+                self.report_file = os.path.join(config.IMPORT_REPORT_DIR, name)
+            self._report = open(self.report_file, 'w', newline='', encoding='utf-8')
+            self._report_writer = csv.writer(self._report)
+            self._report_writer.writerow(REPORT_FIELDS)
+        self._report_writer.writerow([line, codigo, error])
+
+    def _flush(self, batch, summary):
+        """Inserta un lote; si la transacción falla, reintenta fila a fila para aislar los errores"""
+        if not batch:
+            return
+        index = {field: CLIENT_FIELDS.index(field) for field in ('ingresos_anuales', 'gasto_mensual', 'carga_familiar')}
+        classes = self.crud.classifier.classify_arrays(
+            [values[index['ingresos_anuales']] for _, values in batch],
+            [values[index['gasto_mensual']] for _, values in batch],
+            [values[index['carga_familiar']] for _, values in batch]
+        )
+        batch[:] = [
+            (line, values[:COMPUTED_INDEX] + (int(clase),) + values[COMPUTED_INDEX + 1:])
+            for (line, values), clase in zip(batch, classes)
+        ]
+        if self.crud.create_clients_batch([values for _, values in batch]) is not False:
+            summary['insertados'] += len(batch)
+        else:
+            for line, values in batch:
+                if self.crud.create_clients_batch([values]) is not False:
+                    summary['insertados'] += 1
+                else:
+                    summary['errores'] += 1
+                    self._report_error(line, values[0], "Error de base de datos al insertar la fila")
+        batch.clear()
+
+    def run(self, stream):
+        """
+        Importar el CSV abierto en modo texto.
+        :param stream: archivo de texto con cabecera que incluye CLIENT_FIELDS
+        :return: dict con total, insertados, errores y reporte (ruta o None)
+        """
+        reader = csv.DictReader(stream)
+        missing = [field for field in CLIENT_FIELDS
+                   if field != COMPUTED_FIELD and field not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"Faltan columnas en el archivo: {', '.join(missing)}")
+
+        summary = {'total': 0, 'insertados': 0, 'errores': 0, 'reporte': None}
+        batch = []
+        try:
+            for row in reader:
+                summary['total'] += 1
+                values, error = validate_row(row)
+                if error:
+                    summary['errores'] += 1
+                    self._report_error(reader.line_num, row.get('codigo_cliente', ''), error)
+                    continue
+                batch.append((reader.line_num, values))
+                if len(batch) >= self.batch_size:
+                    self._flush(batch, summary)
+            self._flush(batch, summary)
+        finally:
+            if self._report is not None:
+                self._report.close()
+                summary['reporte'] = self.report_file
+
+        if summary['insertados']:
+            # los ids de un INSERT por lotes no se conocen fila a fila: se reconstruye el índice
+            self.crud.search_index.invalidate()
+
+        logger.info("Importación terminada - %s insertados, %s errores", summary['insertados'], summary['errores'])
+        return summary
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Importación masiva de clientes desde CSV")
+    parser.add_argument('archivo', help="CSV con cabecera: " + ', '.join(f for f in CLIENT_FIELDS if f != COMPUTED_FIELD))
+    parser.add_argument('--batch-size', type=int, default=config.IMPORT_BATCH_SIZE,
+                        help="filas por transacción")
+    parser.add_argument('--reporte', help="ruta del CSV de errores")
+    args = parser.parse_args()
+
+    with open(args.archivo, newline='', encoding='utf-8-sig') as f:
+        result = ClientImporter(batch_size=args.batch_size, report_file=args.reporte).run(f)
+
+    print(f"Filas: {result['total']}  Insertados: {result['insertados']}  Errores: {result['errores']}")
+    if result['reporte']:
+        print(f"Reporte de errores: {result['reporte']}")
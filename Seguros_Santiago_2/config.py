@@ -0,0 +1,114 @@
+import os
+import tempfile
+
+# Conexión a MySQL (se puede sobreescribir con variables de entorno)
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'database': os.environ.get('DB_NAME', 'seguros_santiago_2'),
+    'user': os.environ.get('DB_USER', 'root'),
+    'password': os.environ.get('DB_PASSWORD', 'Marce_75'),
+    'autocommit': True  # 👈 habilitamos autocommit para evitar problemas
+}
+
+# Réplicas de lectura: "host:puerto,host:puerto" (vacío = todo va al primario)
+DB_REPLICAS = [
+    (host, int(port or 3306))
+    for host, _, port in (item.strip().partition(':') for item in os.environ.get('DB_REPLICAS', '').split(','))
+    if host
+]
+DB_REPLICA_STRATEGY = os.environ.get('DB_REPLICA_STRATEGY', 'round_robin')    # round_robin | least_busy
+DB_REPLICA_RETRY_SECONDS = float(os.environ.get('DB_REPLICA_RETRY_SECONDS', 30))  # tiempo fuera de una réplica caída
+DB_READ_YOUR_WRITES_SECONDS = float(os.environ.get('DB_READ_YOUR_WRITES_SECONDS', 5))  # lecturas al primario tras escribir
+
+# Pool de conexiones compartido por todos los modelos del proceso
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))                # conexiones que se mantienen abiertas
+DB_POOL_MAX_OVERFLOW = int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10))  # conexiones extra en picos
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))       # segundos de inactividad antes de reconectar
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))       # segundos de espera por una conexión libre
+
+# Consultas independientes de una página ejecutadas en paralelo (Database.gather)
+DB_FANOUT_WORKERS = int(os.environ.get('DB_FANOUT_WORKERS', 8))          # 0 ejecuta en secuencia
+DB_FANOUT_TIMEOUT = float(os.environ.get('DB_FANOUT_TIMEOUT', 30))       # segundos máximos por consulta
+
+# Sentencias preparadas en el servidor, cacheadas por conexión (opcional)
+DB_PREPARED_STATEMENTS = os.environ.get('DB_PREPARED_STATEMENTS', '0') == '1'
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get('DB_STATEMENT_CACHE_SIZE', 64))  # sentencias por conexión
+
+# Caché en memoria de catálogos (Tipos_Seguros, Clasificaciones_*)
+CATALOG_CACHE_TTL = int(os.environ.get('CATALOG_CACHE_TTL', 300))  # segundos; 0 desactiva la caché
+CATALOG_CACHE_WARMUP = os.environ.get('CATALOG_CACHE_WARMUP', '1') == '1'  # precargar al iniciar la app
+
+# Importación masiva de clientes
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 500))  # filas por transacción
+IMPORT_REPORT_DIR = os.environ.get('IMPORT_REPORT_DIR', tempfile.gettempdir())  # reportes de errores descargables
+IMPORT_REPORT_TTL = int(os.environ.get('IMPORT_REPORT_TTL', 86400))  # segundos que se guarda un reporte no descargado
+
+# Exportación de la cartera
+EXPORT_FETCH_SIZE = int(os.environ.get('EXPORT_FETCH_SIZE', 1000))  # filas por fetchmany
+
+# Clasificación automática del sistema (id_clasificacion_sistema).
+# Se evalúan en orden y gana la primera regla que se cumple; cada condición es
+# métrica: (mínimo inclusive, máximo exclusivo), con None como "sin límite".
+# Métricas: ingresos_anuales, gasto_mensual, carga_familiar,
+#           ratio_gasto (gasto anual / ingresos), ingreso_per_capita (ingresos / (1 + carga)).
+# Los ids deben corresponder a filas de Clasificaciones_Sistema.
+CLASSIFICATION_RULES = [
+    {'id': 1, 'when': {'ingresos_anuales': (36000000, None), 'ratio_gasto': (None, 0.5)}},
+    {'id': 2, 'when': {'ingreso_per_capita': (6000000, None), 'ratio_gasto': (None, 0.8)}},
+]
+CLASSIFICATION_DEFAULT = 3
+CLASSIFICATION_BATCH_SIZE = int(os.environ.get('CLASSIFICATION_BATCH_SIZE', 10000))  # filas por lote al recalcular
+
+# Métricas y log de consultas lentas
+METRICS_SLOW_QUERY_MS = float(os.environ.get('METRICS_SLOW_QUERY_MS', 200))  # umbral del log de consultas lentas
+METRICS_MAX_STATEMENTS = int(os.environ.get('METRICS_MAX_STATEMENTS', 500))  # series por sentencia; el resto va a 'otras'
+
+# Índice de búsqueda de clientes en memoria
+SEARCH_INDEX_REFRESH_SECONDS = int(os.environ.get('SEARCH_INDEX_REFRESH_SECONDS', 600))  # reconstrucción periódica; 0 = nunca
+SEARCH_INDEX_WARMUP = os.environ.get('SEARCH_INDEX_WARMUP', '0') == '1'  # construir al iniciar la app
+SEARCH_RESULTS_LIMIT = int(os.environ.get('SEARCH_RESULTS_LIMIT', 10))
+
+# API de consulta masiva de clientes (/api/clients?ids=...)
+API_MAX_IDS = int(os.environ.get('API_MAX_IDS', 1000))      # ids por request
+API_IDS_CHUNK_SIZE = int(os.environ.get('API_IDS_CHUNK_SIZE', 500))  # ids por consulta IN
+
+# Acciones masivas del agente (/agent/clients/bulk)
+BULK_MAX_IDS = int(os.environ.get('BULK_MAX_IDS', 2000))        # clientes por acción
+BULK_CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE', 500))   # ids por sentencia IN dentro de la transacción
+
+# Estadísticas de cartera precalculadas (portfolio_stats.py, tabla Estadisticas_Cartera).
+# Límites inferiores de las bandas de ingresos anuales; cambiarlos requiere --rebuild
+STATS_INCOME_BANDS = [int(b) for b in os.environ.get(
+    'STATS_INCOME_BANDS', '0,6000000,12000000,24000000,36000000,60000000'
+).split(',')]
+
+# GET condicional: se agrega a los ETag para invalidarlos al cambiar las plantillas
+ETAG_SALT = os.environ.get('ETAG_SALT', '1')
+
+# Hash de contraseñas (PBKDF2-SHA256) y pool de verificación
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 260000))  # costo del hash
+PASSWORD_WORKERS = int(os.environ.get('PASSWORD_WORKERS', 4))              # hilos de hashing
+PASSWORD_MAX_QUEUE = int(os.environ.get('PASSWORD_MAX_QUEUE', 32))         # verificaciones en espera antes de rechazar
+PASSWORD_VERIFY_TIMEOUT = float(os.environ.get('PASSWORD_VERIFY_TIMEOUT', 5))  # segundos por verificación
+
+# Revisión de planes de ejecución (query_plans.py, EXPLAIN FORMAT=JSON sobre una base sembrada)
+PLAN_LARGE_TABLE_ROWS = int(os.environ.get('PLAN_LARGE_TABLE_ROWS', 10000))  # tablas más chicas no se revisan
+PLAN_MAX_SCAN_ROWS = int(os.environ.get('PLAN_MAX_SCAN_ROWS', 1000))          # filas de un scan completo antes de fallar
+PLAN_MAX_FILESORT_ROWS = int(os.environ.get('PLAN_MAX_FILESORT_ROWS', 1000))  # filas ordenadas con filesort antes de fallar
+# Pasos que recorren toda la tabla a propósito (listados completos, exportación, procesos batch)
+PLAN_ALLOW_FULL_SCAN = [s for s in os.environ.get(
+    'PLAN_ALLOW_FULL_SCAN',
+    'get_all_clients,iter_all_clients,get_all_users,get_all_users_debug,'
+    'search_clients,recompute_all,portfolio_stats_verify'
+).split(',') if s]
+
+# Logging asíncrono (logging_setup.py)
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')                 # json | text
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))     # eventos en espera antes de descartar
+# Fracción de eventos INFO/DEBUG que se escriben por logger: "logger=fracción,..."
+LOG_SAMPLE_RATES = {
+    name.strip(): float(rate)
+    for name, rate in (item.split('=', 1) for item in
+                       os.environ.get('LOG_SAMPLE_RATES', 'werkzeug=0.1').split(',') if '=' in item)
+}
@@ -1,119 +1,588 @@
+import base64
+import json
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+import config
+from classification import ClassificationEngine
 from database import Database
+from passwords import default_verifier
+from portfolio_stats import NO_VALUE, STATS_FIELDS, PortfolioStats, StatsDelta
+from search_index import ClientSearchIndex
+
+# Columnas por las que se puede ordenar la lista de clientes (nombre público -> columna)
+CLIENT_SORT_COLUMNS = {
+    'id': 'c.id_cliente',
+    'codigo': 'c.codigo_cliente',
+    'nombre': 'c.nombre',
+    'apellido': 'c.apellido',
+    'rut': 'c.rut',
+}
+
+# Filtros aceptados por la lista de clientes (nombre público -> columna)
+CLIENT_FILTER_COLUMNS = {
+    'tipo_seguro': 'c.id_tipo_seguro',
+    'clasificacion_sistema': 'c.id_clasificacion_sistema',
+    'clasificacion_agente': 'c.id_clasificacion_agente',
+    'usuario': 'c.id_usuario',
+}
+
+# Columnas de Clientes que se informan al crear un cliente, en orden de inserción
+CLIENT_FIELDS = (
+    'codigo_cliente', 'id_usuario', 'rut', 'nombre', 'apellido', 'direccion',
+    'telefono', 'correo_electronico', 'genero', 'id_tipo_seguro',
+    'ingresos_anuales', 'gasto_mensual', 'carga_familiar',
+    'id_clasificacion_sistema', 'id_clasificacion_agente'
+)
+
+CLIENT_INSERT = """
+    INSERT INTO Clientes (
+        codigo_cliente, id_usuario, rut, nombre, apellido, direccion, 
+        telefono, correo_electronico, genero, id_tipo_seguro, 
+        ingresos_anuales, gasto_mensual, carga_familiar, 
+        id_clasificacion_sistema, id_clasificacion_agente
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+# Columnas de los datos maestros y usuario: nombre -> (expresión, join que requiere)
+JOINED_COLUMNS = {
+    'nombre_tipo_seguro': ("ts.nombre_tipo_seguro",
+                           "LEFT JOIN Tipos_Seguros ts ON c.id_tipo_seguro = ts.id_tipo_seguro"),
+    'clasificacion_sistema': ("cs.nombre AS clasificacion_sistema",
+                              "LEFT JOIN Clasificaciones_Sistema cs ON c.id_clasificacion_sistema = cs.id_clasificacion_sistema"),
+    'clasificacion_agente': ("ca.nombre AS clasificacion_agente",
+                             "LEFT JOIN Clasificaciones_Agente ca ON c.id_clasificacion_agente = ca.id_clasificacion_agente"),
+    'nombre_usuario': ("u.nombre_usuario",
+                       "LEFT JOIN Usuarios u ON c.id_usuario = u.id_usuario"),
+}
+
+# Campos que puede editar un agente y el propio cliente (id_clasificacion_sistema se calcula)
+UPDATABLE_FIELDS = tuple(f for f in CLIENT_FIELDS if f not in ('id_usuario', 'id_clasificacion_sistema'))
+LIMITED_FIELDS = ('direccion', 'telefono', 'correo_electronico',
+                  'ingresos_anuales', 'gasto_mensual', 'carga_familiar')
+
+# Resultados de update_client / update_client_limited
+UPDATED = 'actualizado'
+UNCHANGED = 'sin_cambios'
+CONFLICT = 'conflicto'
+
+# Columnas que se pueden asignar en bloque con bulk_update_clients
+BULK_FIELDS = ('id_clasificacion_agente', 'id_tipo_seguro')
+
+# Resultado por id de las acciones masivas
+BULK_UPDATED = 'actualizado'
+BULK_UNCHANGED = 'sin_cambios'
+BULK_DELETED = 'eliminado'
+BULK_NOT_FOUND = 'no_encontrado'
+
+# Campos que se pueden pedir en get_clients_by_ids
+CLIENT_COLUMNS = ('id_cliente',) + CLIENT_FIELDS + ('version',)
+SELECTABLE_FIELDS = CLIENT_COLUMNS + tuple(JOINED_COLUMNS)
+
+# Proyecciones por vista: solo las columnas (y joins) que cada una muestra
+PROJECTIONS = {
+    # client_list.html; incluye todas las columnas de CLIENT_SORT_COLUMNS para los cursores
+    'list': ('id_cliente', 'codigo_cliente', 'nombre', 'apellido', 'rut', 'correo_electronico',
+             'telefono', 'nombre_tipo_seguro', 'clasificacion_sistema'),
+    # tarjetas de clientes recientes del dashboard del agente
+    'card': ('id_cliente', 'codigo_cliente', 'nombre', 'apellido', 'correo_electronico', 'telefono'),
+    # vista, dashboard y formularios de edición de un cliente
+    'detail': CLIENT_COLUMNS + ('nombre_tipo_seguro', 'clasificacion_sistema', 'clasificacion_agente'),
+    # API JSON y exportación: todos los campos
+    'api': SELECTABLE_FIELDS,
+}
+
+
+@lru_cache(maxsize=128)
+def projection_select(projection):
+    """
+    SELECT ... FROM Clientes c con las columnas de una proyección y solo los joins que requiere.
+    :param projection: nombre en PROJECTIONS o tupla de campos de SELECTABLE_FIELDS
+    """
+    fields = PROJECTIONS[projection] if isinstance(projection, str) else projection
+    columns = [f"c.{f}" for f in fields if f in CLIENT_COLUMNS]
+    joins = []
+    for f in fields:
+        if f in JOINED_COLUMNS:
+            expression, join = JOINED_COLUMNS[f]
+            columns.append(expression)
+            joins.append(join)
+    return f"SELECT {', '.join(columns)} FROM Clientes c {' '.join(joins)}".rstrip()
+
+
+# Cliente completo con los nombres de sus datos maestros y usuario
+CLIENT_SELECT = projection_select('api')
+
+
+def same_value(current, submitted):
+    """Compara el valor de la fila con el del formulario (texto) sin falsos cambios por tipo"""
+    if current is None or submitted is None:
+        return (current is None or current == '') and (submitted is None or submitted == '')
+    if isinstance(current, (int, float, Decimal)) and not isinstance(current, bool):
+        try:
+            return Decimal(str(current)) == Decimal(str(submitted).strip())
+        except InvalidOperation:
+            return False
+    return str(current) == str(submitted)
+
+
+def changed_fields(original, submitted):
+    """Campos de `submitted` cuyo valor difiere del de la fila `original`"""
+    return {field: value for field, value in submitted.items() if not same_value(original.get(field), value)}
+
+
+def encode_cursor(sort_value, client_id):
+    """Codifica la posición (valor de orden, id_cliente) de una fila como token opaco"""
+    raw = json.dumps([sort_value, client_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(token):
+    """Inverso de encode_cursor; devuelve None si el token no es válido"""
+    try:
+        sort_value, client_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return sort_value, int(client_id)
+    except (ValueError, TypeError):
+        return None
+
+
+class CatalogCache:
+    """Caché en memoria con TTL para tablas maestras que casi no cambian"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}  # nombre -> (filas, instante de expiración)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name, loader):
+        """Devuelve el catálogo `name`, cargándolo con `loader()` si no está vigente"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry and entry[1] > now:
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        rows = loader()
+        if rows is not False and self.ttl > 0:  # los errores no se guardan
+            with self._lock:
+                self._entries[name] = (rows, now + self.ttl)
+        return rows
+
+    def invalidate(self, name=None):
+        """Invalida un catálogo, o todos si no se indica nombre"""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'cached': sorted(self._entries),
+                'ttl': self.ttl,
+            }
+
 
 class CRUDModel:
     def __init__(self):
         self.db = Database()
+        self.catalogs = CatalogCache(config.CATALOG_CACHE_TTL)
+        self.classifier = ClassificationEngine()
+        self.search_index = ClientSearchIndex(self.db, config.SEARCH_INDEX_REFRESH_SECONDS)
+        self.stats = PortfolioStats(self.db)
+        self.passwords = default_verifier()
 
     # --------------------------
     # CLIENTES
     # --------------------------
-    def get_all_clients(self):
-        query = """
-            SELECT 
-                c.*, 
-                ts.nombre_tipo_seguro, 
-                cs.nombre as clasificacion_sistema, 
-                ca.nombre as clasificacion_agente,
-                u.nombre_usuario
-            FROM Clientes c
-            LEFT JOIN Tipos_Seguros ts ON c.id_tipo_seguro = ts.id_tipo_seguro
-            LEFT JOIN Clasificaciones_Sistema cs ON c.id_clasificacion_sistema = cs.id_clasificacion_sistema
-            LEFT JOIN Clasificaciones_Agente ca ON c.id_clasificacion_agente = ca.id_clasificacion_agente
-            LEFT JOIN Usuarios u ON c.id_usuario = u.id_usuario
-        """
-        return self.db.execute_query(query)
-
-    def get_client_by_id(self, client_id):
-        query = """
-            SELECT 
-                c.*, 
-                ts.nombre_tipo_seguro, 
-                cs.nombre as clasificacion_sistema, 
-                ca.nombre as clasificacion_agente,
-                u.nombre_usuario
-            FROM Clientes c
-            LEFT JOIN Tipos_Seguros ts ON c.id_tipo_seguro = ts.id_tipo_seguro
-            LEFT JOIN Clasificaciones_Sistema cs ON c.id_clasificacion_sistema = cs.id_clasificacion_sistema
-            LEFT JOIN Clasificaciones_Agente ca ON c.id_clasificacion_agente = ca.id_clasificacion_agente
-            LEFT JOIN Usuarios u ON c.id_usuario = u.id_usuario
-            WHERE c.id_cliente = %s
+    def get_all_clients(self, projection='api', compact=True):
+        """Todos los clientes; por defecto como filas compactas (Record)"""
+        return self.db.execute_query(projection_select(projection), compact=compact)
+
+    def get_clients_page(self, filters=None, sort='id', direction='asc',
+                         after=None, before=None, limit=50, projection='list', compact=True):
+        """
+        Página de clientes con paginación por keyset (sin OFFSET).
+        :param filters: dict con claves de CLIENT_FILTER_COLUMNS
+        :param sort: clave de CLIENT_SORT_COLUMNS
+        :param direction: 'asc' | 'desc'
+        :param after: cursor de la última fila de la página anterior
+        :param before: cursor de la primera fila de la página siguiente
+        :param limit: filas por página
+        :param projection: nombre en PROJECTIONS (se le agrega la columna de orden si falta)
+        :param compact: filas como Record en vez de dict
+        :return: dict con clients, next_cursor, prev_cursor
         """
+        sort_key = sort if sort in CLIENT_SORT_COLUMNS else 'id'
+        sort_column = CLIENT_SORT_COLUMNS[sort_key]
+        descending = direction == 'desc'
+
+        where, params = [], []
+        for key, value in (filters or {}).items():
+            if key in CLIENT_FILTER_COLUMNS and value not in (None, ''):
+                where.append(f"{CLIENT_FILTER_COLUMNS[key]} = %s")
+                params.append(value)
+
+        # Al retroceder se recorre el índice en sentido inverso y luego se invierte el resultado
+        cursor = decode_cursor(before) if before else (decode_cursor(after) if after else None)
+        backwards = bool(before) and cursor is not None
+        scan_desc = descending != backwards
+        op = '<' if scan_desc else '>'
+        order = 'DESC' if scan_desc else 'ASC'
+
+        if cursor is not None:
+            sort_value, last_id = cursor
+            if sort_key == 'id':
+                where.append(f"c.id_cliente {op} %s")
+                params.append(last_id)
+            else:
+                where.append(f"({sort_column} {op} %s OR ({sort_column} = %s AND c.id_cliente {op} %s))")
+                params.extend([sort_value, sort_value, last_id])
+
+        fields = PROJECTIONS[projection]
+        sort_field = sort_column.split('.', 1)[1]
+        if sort_field not in fields:
+            fields += (sort_field,)
+        query = projection_select(fields)
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        if sort_key == 'id':
+            query += f" ORDER BY c.id_cliente {order}"
+        else:
+            query += f" ORDER BY {sort_column} {order}, c.id_cliente {order}"
+        query += " LIMIT %s"
+        params.append(limit + 1)  # una fila extra para saber si hay más páginas
+
+        rows = self.db.execute_query(query, tuple(params), compact=compact)
+        if rows is False:
+            return None
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if backwards:
+            rows.reverse()
+
+        def row_cursor(row):
+            return encode_cursor(row[sort_field], row['id_cliente'])
+
+        has_next = has_more if not backwards else True
+        has_prev = has_more if backwards else cursor is not None
+        return {
+            'clients': rows,
+            'next_cursor': row_cursor(rows[-1]) if rows and has_next else None,
+            'prev_cursor': row_cursor(rows[0]) if rows and has_prev else None,
+            'sort': sort_key,
+            'direction': 'desc' if descending else 'asc',
+        }
+
+    def get_client_by_id(self, client_id, projection='detail'):
+        query = projection_select(projection) + " WHERE c.id_cliente = %s"
         result = self.db.execute_query(query, (client_id,))
         return result[0] if result else None
 
+    def get_clients_by_ids(self, client_ids, fields=None, chunk_size=None):
+        """
+        Varios clientes por id con consultas IN por tramos.
+        :param client_ids: ids en el orden en que se quieren los resultados
+        :param fields: campos de SELECTABLE_FIELDS a devolver (None = todos); solo se
+                       hacen los joins de los campos pedidos
+        :return: dict con clients (en el orden pedido, sin repetidos) y missing
+        """
+        chunk_size = chunk_size or config.API_IDS_CHUNK_SIZE
+        ids = list(dict.fromkeys(client_ids))  # sin repetidos, conservando el orden
+        fields = [f for f in (fields or SELECTABLE_FIELDS) if f in SELECTABLE_FIELDS]
+        if 'id_cliente' not in fields:
+            fields.insert(0, 'id_cliente')
+
+        base = projection_select(tuple(fields)) + " WHERE c.id_cliente IN "
+
+        found = {}
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            rows = self.db.execute_query(base + f"({', '.join(['%s'] * len(chunk))})", tuple(chunk))
+            if rows is False:
+                return None
+            for row in rows:
+                found[row['id_cliente']] = row
+
+        return {
+            'clients': [found[i] for i in ids if i in found],
+            'missing': [i for i in ids if i not in found],
+        }
+
+    def get_client_version(self, client_id, user_id=None):
+        """
+        Versión actual de un cliente por PK, para responder GET condicionales sin
+        hacer el join completo. Con `user_id` solo la devuelve si el cliente es de ese usuario.
+        """
+        query = "SELECT version FROM Clientes WHERE id_cliente = %s"
+        params = (client_id,)
+        if user_id is not None:
+            query += " AND id_usuario = %s"
+            params += (user_id,)
+        result = self.db.execute_query(query, params, one=True)
+        return result['version'] if result else None
+
+    def iter_all_clients(self, batch_size=None, projection='api', compact=True):
+        """Igual que get_all_clients, pero entregando lotes de filas en streaming"""
+        return self.db.stream_query(projection_select(projection),
+                                    batch_size=batch_size or config.EXPORT_FETCH_SIZE, compact=compact)
+
+    def get_portfolio_stats(self):
+        """
+        Resumen del dashboard del agente y desglose de la cartera por tipo de seguro,
+        clasificaciones y banda de ingresos, con una sola lectura de Estadisticas_Cartera
+        (sin recorrer Clientes).
+        :return: {'resumen': conteos, 'desglose': dimension -> lista de
+                  {'clave', 'nombre', 'clientes', 'carga_familiar', 'ingresos_anuales'}} | False si hubo error
+        """
+        stats = self.stats.read()
+        if stats is False:
+            return False
+        total = stats['total'].get(NO_VALUE, {})
+        summary = {
+            'total_clientes': total.get('clientes', 0),
+            'carga_familiar_total': total.get('carga_familiar', 0),
+        }
+
+        names = {
+            'tipo_seguro': {str(t['id_tipo_seguro']): t['nombre_tipo_seguro'] for t in self.get_tipos_seguro() or []},
+            'clasificacion_sistema': {str(c['id_clasificacion_sistema']): c['nombre']
+                                      for c in self.get_clasificaciones_sistema() or []},
+            'clasificacion_agente': {str(c['id_clasificacion_agente']): c['nombre']
+                                     for c in self.get_clasificaciones_agente() or []},
+        }
+        bands = [str(b) for b in config.STATS_INCOME_BANDS]
+        names['banda_ingresos'] = {
+            low: f"{int(low):,}".replace(',', '.') + (f" – {int(high) - 1:,}".replace(',', '.') if high else ' o más')
+            for low, high in zip(bands, bands[1:] + [None])
+        }
+
+        breakdown = {}
+        for dimension in ('tipo_seguro', 'clasificacion_sistema', 'clasificacion_agente', 'banda_ingresos'):
+            rows = [dict(values, clave=key, nombre=names[dimension].get(key, key or 'Sin asignar'))
+                    for key, values in stats[dimension].items()]
+            if dimension == 'banda_ingresos':
+                rows.sort(key=lambda row: int(row['clave']) if row['clave'] else -1)
+            else:
+                rows.sort(key=lambda row: -row['clientes'])
+            breakdown[dimension] = rows
+        return {'resumen': summary, 'desglose': breakdown}
+
+    def get_recent_clients(self, limit=5):
+        """Los `limit` clientes más recientes, recorriendo la PK hacia atrás"""
+        query = projection_select('card') + " ORDER BY c.id_cliente DESC LIMIT %s"
+        return self.db.execute_query(query, (limit,))
+
+    def get_client_by_user_id(self, user_id, projection='detail'):
+        """Cliente asociado a un usuario, con sus joins, en una sola consulta"""
+        query = projection_select(projection) + " WHERE c.id_usuario = %s LIMIT 1"
+        result = self.db.execute_query(query, (user_id,))
+        return result[0] if result else None
+
     def create_client(self, client_data):
-        query = """
-            INSERT INTO Clientes (
-                codigo_cliente, id_usuario, rut, nombre, apellido, direccion, 
-                telefono, correo_electronico, genero, id_tipo_seguro, 
-                ingresos_anuales, gasto_mensual, carga_familiar, 
-                id_clasificacion_sistema, id_clasificacion_agente
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        # la clasificación del sistema se calcula, no se toma del formulario
+        client_data = dict(client_data, id_clasificacion_sistema=self.classifier.classify(client_data))
+        values = tuple(client_data[field] for field in CLIENT_FIELDS)
+
+        def insert(cursor):
+            cursor.execute(CLIENT_INSERT, values)
+            client_id = cursor.lastrowid
+            StatsDelta().add(client_data).apply(cursor)
+            return client_id
+
+        client_id = self.db.execute_write(CLIENT_INSERT, insert)
+        if client_id:
+            self.search_index.add(client_id, client_data)
+        return client_id
+
+    def create_clients_batch(self, rows):
         """
-        values = (
-            client_data['codigo_cliente'],
-            client_data['id_usuario'],
-            client_data['rut'],
-            client_data['nombre'],
-            client_data['apellido'],
-            client_data['direccion'],
-            client_data['telefono'],
-            client_data['correo_electronico'],
-            client_data['genero'],
-            client_data['id_tipo_seguro'],
-            client_data['ingresos_anuales'],
-            client_data['gasto_mensual'],
-            client_data['carga_familiar'],
-            client_data['id_clasificacion_sistema'],
-            client_data['id_clasificacion_agente']
-        )
-        return self.db.execute_query(query, values, fetch=False)
+        Insertar varios clientes en una sola transacción.
+        :param rows: lista de tuplas en el orden de CLIENT_FIELDS
+        :return: filas insertadas | False si se revirtió el lote
+        """
+        def insert(cursor):
+            cursor.executemany(CLIENT_INSERT, rows)
+            inserted = cursor.rowcount
+            delta = StatsDelta()
+            for row in rows:
+                delta.add(dict(zip(CLIENT_FIELDS, row)))
+            delta.apply(cursor)
+            return inserted
 
-    def update_client(self, client_id, client_data):
-        query = """
-            UPDATE Clientes SET 
-                codigo_cliente=%s, rut=%s, nombre=%s, apellido=%s, 
-                direccion=%s, telefono=%s, correo_electronico=%s, genero=%s, 
-                id_tipo_seguro=%s, ingresos_anuales=%s, gasto_mensual=%s, 
-                carga_familiar=%s, id_clasificacion_sistema=%s, 
-                id_clasificacion_agente=%s 
-            WHERE id_cliente=%s
+        return self.db.execute_write(CLIENT_INSERT, insert)
+
+    def update_client(self, client_id, client_data, original=None, expected_version=None):
         """
-        values = (
-            client_data['codigo_cliente'],
-            client_data['rut'],
-            client_data['nombre'],
-            client_data['apellido'],
-            client_data['direccion'],
-            client_data['telefono'],
-            client_data['correo_electronico'],
-            client_data['genero'],
-            client_data['id_tipo_seguro'],
-            client_data['ingresos_anuales'],
-            client_data['gasto_mensual'],
-            client_data['carga_familiar'],
-            client_data['id_clasificacion_sistema'],
-            client_data['id_clasificacion_agente'],
-            client_id
-        )
-        return self.db.execute_query(query, values, fetch=False)
+        Actualizar solo las columnas que cambiaron respecto de `original`, con control
+        de concurrencia optimista sobre la columna version.
+        :param client_data: campos de UPDATABLE_FIELDS enviados por el formulario
+        :param original: fila del cliente con la que se compara (None = se lee por id)
+        :param expected_version: versión sobre la que se editó (None = la de `original`)
+        :return: UPDATED | UNCHANGED | CONFLICT | False si no existe o hubo error
+        """
+        return self._update_changed(client_id, client_data, UPDATABLE_FIELDS, original, expected_version)
+
+    def update_client_limited(self, client_id, client_data, original=None, expected_version=None):
+        """Edición que el propio cliente puede hacer de sus datos de contacto y económicos"""
+        return self._update_changed(client_id, client_data, LIMITED_FIELDS, original, expected_version)
+
+    def _update_changed(self, client_id, client_data, allowed, original, expected_version):
+        if original is None:
+            original = self.get_client_by_id(client_id)
+            if not original:
+                return False
+        if expected_version is None:
+            expected_version = original['version']
+        elif int(expected_version) != original['version']:
+            return CONFLICT  # la fila ya cambió desde que se cargó el formulario
+
+        changes = changed_fields(original, {f: client_data[f] for f in allowed if f in client_data})
+        # la clasificación del sistema se recalcula sobre la fila resultante
+        classification = self.classifier.classify(dict(original, **changes))
+        if classification != original['id_clasificacion_sistema']:
+            changes['id_clasificacion_sistema'] = classification
+        if not changes:
+            return UNCHANGED
+
+        assignments = ', '.join(f"{field}=%s" for field in changes)
+        query = f"UPDATE Clientes SET {assignments}, version=version+1 WHERE id_cliente=%s AND version=%s"
+
+        def update(cursor):
+            cursor.execute(query, (*changes.values(), client_id, expected_version))
+            updated = cursor.rowcount
+            # con la versión esperada, `original` es exactamente la fila que se reemplazó
+            if updated and any(field in changes for field in STATS_FIELDS):
+                StatsDelta().move(original, dict(original, **changes)).apply(cursor)
+            return updated
+
+        updated = self.db.execute_write(query, update)
+        if updated is False:
+            return False
+        if not updated:
+            # 0 filas: otro usuario la modificó (o la eliminó) entre medio
+            return CONFLICT if self.get_client_version(client_id) is not None else False
+        self.search_index.update(client_id, changes)
+        return UPDATED
 
     def delete_client(self, client_id):
+        """
+        Eliminar un cliente y descontarlo de las estadísticas en la misma transacción.
+        :return: True | None si no existe | False si hubo error
+        """
         query = "DELETE FROM Clientes WHERE id_cliente = %s"
-        return self.db.execute_query(query, (client_id,), fetch=False)
+
+        def delete(cursor):
+            cursor.execute(f"SELECT {', '.join(STATS_FIELDS)} FROM Clientes WHERE id_cliente = %s FOR UPDATE",
+                           (client_id,))
+            rows = cursor.fetchall()
+            if not rows:
+                return None
+            cursor.execute(query, (client_id,))
+            StatsDelta().remove(rows[0]).apply(cursor)
+            return True
+
+        result = self.db.execute_write(query, delete)
+        if result:
+            self.search_index.remove(client_id)
+        return result
+
+    def bulk_update_clients(self, client_ids, field, value, chunk_size=None):
+        """
+        Asignar `field` (de BULK_FIELDS) = `value` a varios clientes en una sola transacción.
+        :return: dict id_cliente -> BULK_UPDATED | BULK_UNCHANGED | BULK_NOT_FOUND
+        """
+        if field not in BULK_FIELDS:
+            raise ValueError(f"Campo no permitido en acciones masivas: {field}")
+        return self._bulk_apply(client_ids, field, value, chunk_size)
+
+    def bulk_delete_clients(self, client_ids, chunk_size=None):
+        """
+        Eliminar varios clientes en una sola transacción.
+        :return: dict id_cliente -> BULK_DELETED | BULK_NOT_FOUND
+        """
+        results = self._bulk_apply(client_ids, None, None, chunk_size)
+        for client_id, outcome in results.items():
+            if outcome == BULK_DELETED:
+                self.search_index.remove(client_id)
+        return results
+
+    def _bulk_apply(self, client_ids, field, value, chunk_size):
+        """
+        Por cada tramo de ids: bloquea las filas con SELECT ... FOR UPDATE (para saber cuáles
+        existen y cuáles ya tienen el valor) y aplica un único UPDATE/DELETE ... IN. Todo va en
+        una transacción, junto con el delta de las estadísticas: si algo falla se revierte
+        completa y se propaga la excepción.
+        """
+        chunk_size = chunk_size or config.BULK_CHUNK_SIZE
+        ids = list(dict.fromkeys(int(i) for i in client_ids))
+        results = dict.fromkeys(ids, BULK_NOT_FOUND)
+        delta = StatsDelta()
+
+        with self.db.transaction() as cursor:
+            for start in range(0, len(ids), chunk_size):
+                chunk = ids[start:start + chunk_size]
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(
+                    f"SELECT id_cliente, {', '.join(STATS_FIELDS)} FROM Clientes "
+                    f"WHERE id_cliente IN ({placeholders}) FOR UPDATE",
+                    tuple(chunk)
+                )
+                rows = cursor.fetchall()
+                if field is None:
+                    targets = [row['id_cliente'] for row in rows]
+                    for row in rows:
+                        delta.remove(row)
+                else:
+                    changed = [row for row in rows if not same_value(row[field], value)]
+                    targets = [row['id_cliente'] for row in changed]
+                    for row in changed:
+                        delta.move(row, dict(row, **{field: value}))
+                    results.update(dict.fromkeys((row['id_cliente'] for row in rows), BULK_UNCHANGED))
+                if not targets:
+                    continue
+
+                placeholders = ', '.join(['%s'] * len(targets))
+                if field is None:
+                    cursor.execute(f"DELETE FROM Clientes WHERE id_cliente IN ({placeholders})", tuple(targets))
+                else:
+                    cursor.execute(
+                        f"UPDATE Clientes SET {field} = %s, version = version + 1 WHERE id_cliente IN ({placeholders})",
+                        (value, *targets)
+                    )
+                results.update(dict.fromkeys(targets, BULK_UPDATED if field else BULK_DELETED))
+            delta.apply(cursor)
+        return results
+
+    def search_clients(self, text, limit=None):
+        """Búsqueda por rut, nombre, apellido, correo o código (prefijo y trigramas)"""
+        return self.search_index.search(text, limit or config.SEARCH_RESULTS_LIMIT)
 
     # --------------------------
     # USUARIOS
     # --------------------------
-    def get_all_users(self):
+    def get_all_users(self, compact=True):
         query = """
             SELECT u.*, r.nombre_rol 
             FROM Usuarios u 
             JOIN Roles r ON u.id_rol = r.id_rol
         """
-        return self.db.execute_query(query)
+        return self.db.execute_query(query, compact=compact)
 
     def create_user(self, user_data):
+        """
+        Crear un usuario; la contraseña se hashea en el pool acotado de passwords.
+        Lanza PasswordBusyError si el pool está saturado.
+        """
         query = """
             INSERT INTO Usuarios (codigo_usuario, nombre_usuario, correo_electronico, password, id_rol)
             VALUES (%s, %s, %s, %s, %s)
@@ -122,7 +591,7 @@ class CRUDModel:
             user_data['codigo_usuario'],
             user_data['nombre_usuario'],
             user_data['correo_electronico'],
-            user_data['password'],
+            self.passwords.hash(user_data['password']),
             user_data['id_rol']
         )
         return self.db.execute_query(query, values, fetch=False)
@@ -131,10 +600,28 @@ class CRUDModel:
     # DATOS MAESTROS
     # --------------------------
     def get_tipos_seguro(self):
-        return self.db.execute_query("SELECT * FROM Tipos_Seguros")
+        return self.catalogs.get('tipos_seguro', lambda: self.db.execute_query("SELECT * FROM Tipos_Seguros"))
 
     def get_clasificaciones_sistema(self):
-        return self.db.execute_query("SELECT * FROM Clasificaciones_Sistema")
+        return self.catalogs.get('clasificaciones_sistema', lambda: self.db.execute_query("SELECT * FROM Clasificaciones_Sistema"))
 
     def get_clasificaciones_agente(self):
-        return self.db.execute_query("SELECT * FROM Clasificaciones_Agente")
\ No newline at end of file
+        return self.catalogs.get('clasificaciones_agente', lambda: self.db.execute_query("SELECT * FROM Clasificaciones_Agente"))
+
+    def catalog_calls(self):
+        """Cargas de catálogos para combinar con otras consultas en Database.gather"""
+        return {
+            'tipos_seguro': self.get_tipos_seguro,
+            'clasificaciones': self.get_clasificaciones_sistema,
+            'clasificaciones_agente': self.get_clasificaciones_agente,
+        }
+
+    def invalidate_catalogs(self, name=None):
+        """Descartar catálogos en caché tras modificar las tablas maestras"""
+        self.catalogs.invalidate(name)
+
+    def warm_catalogs(self):
+        """Precargar los catálogos para que el primer render no pague las consultas"""
+        self.get_tipos_seguro()
+        self.get_clasificaciones_sistema()
+        self.get_clasificaciones_agente()
\ No newline at end of file
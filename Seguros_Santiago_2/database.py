@@ -1,75 +1,712 @@
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, InterfaceError, OperationalError
+from contextlib import contextmanager
+from collections import deque, OrderedDict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import threading
 import logging
+import time
+
+import config
+import metrics
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+class PoolTimeoutError(Error):
+    """No se obtuvo una conexión libre del pool dentro del tiempo de espera"""
+
+
+class ReplicaError(OperationalError):
+    """Una réplica falló a mitad de una lectura (la réplica ya quedó fuera de servicio)"""
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones MySQL acotado y seguro entre hilos.
+    Mantiene hasta `pool_size` conexiones inactivas y permite abrir hasta
+    `max_overflow` conexiones adicionales en picos de carga, que se cierran
+    al devolverse. Las conexiones inactivas por más de `recycle` segundos se
+    reabren antes de entregarse.
+    """
+
+    def __init__(self, connect_args, pool_size=5, max_overflow=10, recycle=1800, timeout=10, connect=None):
+        self.connect_args = dict(connect_args)
+        self.connect = connect or mysql.connector.connect  # fábrica de conexiones
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.recycle = recycle
+        self.timeout = timeout
+
+        self._idle = deque()  # (conexión, instante en que se devolvió)
+        self._cond = threading.Condition()
+        self._total = 0
+        self._checked_out = 0
+        self._counters = {
+            'checkouts': 0,
+            'created': 0,
+            'recycled': 0,
+            'discarded': 0,
+            'waits': 0,
+            'timeouts': 0,
+        }
+
+    def _open(self):
+        connection = self.connect(**self.connect_args)
+        logger.info("✅ Conexión a MySQL exitosa")
+        return connection
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Obtener una conexión del pool, esperando como máximo `timeout` segundos"""
+        deadline = time.monotonic() + self.timeout
+        connection, idle_since = None, None
+
+        with self._cond:
+            waited = False
+            while True:
+                if self._idle:
+                    connection, idle_since = self._idle.pop()
+                    break
+                if self._total < self.pool_size + self.max_overflow:
+                    self._total += 1  # reservamos el cupo antes de conectar
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise PoolTimeoutError(msg="Tiempo de espera agotado obteniendo conexión del pool")
+                if not waited:
+                    self._counters['waits'] += 1
+                    waited = True
+                self._cond.wait(remaining)
+
+        try:
+            if connection is not None and time.monotonic() - idle_since > self.recycle:
+                self._close_quietly(connection)
+                connection = None
+                with self._cond:
+                    self._counters['recycled'] += 1
+            if connection is None:
+                connection = self._open()
+                with self._cond:
+                    self._counters['created'] += 1
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._checked_out += 1
+            self._counters['checkouts'] += 1
+        return connection
+
+    def release(self, connection, discard=False):
+        """Devolver una conexión al pool; `discard` la cierra en vez de reutilizarla"""
+        with self._cond:
+            self._checked_out -= 1
+            if discard or len(self._idle) >= self.pool_size:
+                self._total -= 1
+                if discard:
+                    self._counters['discarded'] += 1
+                close = True
+            else:
+                self._idle.append((connection, time.monotonic()))
+                close = False
+            self._cond.notify()
+
+        if close:
+            self._close_quietly(connection)
+
+    @property
+    def in_use(self):
+        """Conexiones entregadas en este momento (para elegir la réplica menos ocupada)"""
+        return self._checked_out
+
+    def close_all(self):
+        """Cerrar todas las conexiones inactivas del pool"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._total -= len(idle)
+            self._cond.notify_all()
+        for connection, _ in idle:
+            self._close_quietly(connection)
+        logger.info("🔌 Conexiones del pool MySQL cerradas")
+
+    def stats(self):
+        """Estado actual y contadores acumulados del pool"""
+        with self._cond:
+            stats = {
+                'pool_size': self.pool_size,
+                'max_overflow': self.max_overflow,
+                'open': self._total,
+                'idle': len(self._idle),
+                'checked_out': self._checked_out,
+                'overflow': max(0, self._total - self.pool_size),
+            }
+            stats.update(self._counters)
+        return stats
+
+
+@lru_cache(maxsize=1024)
+def returns_rows(query):
+    """Decide una sola vez por texto SQL si la sentencia devuelve filas"""
+    return query.lstrip().upper().startswith("SELECT")
+
+
+class Record:
+    """
+    Fila compacta: envuelve la tupla que entrega el cursor y comparte entre todas las
+    filas del resultado un único índice columna -> posición. Se lee como dict
+    (row['nombre'], row.get, keys) y como objeto (row.nombre, que es lo que usa Jinja).
+    Es de solo lectura; jsonify y las exportaciones la convierten con to_dict().
+    """
+
+    __slots__ = ('_values',)
+    _index = {}
+
+    def __init__(self, values):
+        self._values = values
+
+    def __getattr__(self, name):
+        try:
+            return self._values[self._index[name]]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __getitem__(self, key):
+        return self._values[self._index[key]]
+
+    def get(self, key, default=None):
+        position = self._index.get(key)
+        return default if position is None else self._values[position]
+
+    def keys(self):
+        return self._index.keys()
+
+    def values(self):
+        return self._values
+
+    def items(self):
+        return zip(self._index, self._values)
+
+    def to_dict(self):
+        return dict(zip(self._index, self._values))
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return self._index.keys() == other._index.keys() and self._values == other._values
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Record({self.to_dict()!r})"
+
+
+@lru_cache(maxsize=256)
+def record_class(columns):
+    """Subclase de Record para una tupla de nombres de columna (una por forma de resultado)"""
+    return type('Record', (Record,), {'__slots__': (), '_index': {name: i for i, name in enumerate(columns)}})
+
+
+def compact_rows(columns, rows):
+    """Envolver las tuplas de un cursor como Record sin copiarlas"""
+    cls = record_class(tuple(columns))
+    return [cls(row) for row in rows]
+
+
+class TimedCursor:
+    """
+    Cursor de una transacción que registra cada sentencia en metrics, igual que
+    execute_query; el resto de la interfaz se delega en el cursor de mysql.connector.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        started = time.perf_counter()
+        try:
+            return self._cursor.execute(query, params)
+        finally:
+            metrics.record_query(query, time.perf_counter() - started)
+
+    def executemany(self, query, seq_params):
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, seq_params)
+        finally:
+            metrics.record_query(query, time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class StatementCache:
+    """
+    Caché LRU de sentencias preparadas de una conexión, indexada por texto SQL.
+    Cada entrada es un cursor preparado que ya ejecutó PREPARE en el servidor;
+    al expulsarse se cierra y el servidor libera la sentencia.
+    """
+
+    # contadores globales de todas las conexiones, para ajustar el tamaño
+    stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+    _stats_lock = threading.Lock()
+
+    def __init__(self, connection, max_size):
+        self.connection = connection
+        self.max_size = max_size
+        self._cursors = OrderedDict()  # query -> (query, cursor)
+
+    @classmethod
+    def _count(cls, name):
+        with cls._stats_lock:
+            cls.stats[name] += 1
+
+    def get(self, query):
+        """
+        Devuelve (sql, cursor) para la sentencia. Se reutiliza el mismo objeto
+        str que se preparó para que el cursor no vuelva a hacer PREPARE.
+        """
+        entry = self._cursors.get(query)
+        if entry is not None:
+            self._cursors.move_to_end(query)
+            self._count('hits')
+            return entry
+
+        self._count('misses')
+        entry = (query, self.connection.cursor(prepared=True))
+        self._cursors[query] = entry
+        if len(self._cursors) > self.max_size:
+            _, (_, evicted) = self._cursors.popitem(last=False)
+            self._count('evictions')
+            try:
+                evicted.close()
+            except Exception:
+                pass
+        return entry
+
+    def discard(self, query):
+        """Quitar una sentencia que falló para que se prepare de nuevo"""
+        entry = self._cursors.pop(query, None)
+        if entry is not None:
+            try:
+                entry[1].close()
+            except Exception:
+                pass
+
+    @classmethod
+    def hit_rate(cls):
+        with cls._stats_lock:
+            stats = dict(cls.stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Pool compartido por todo el proceso, creado a partir de config"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    config.DB_CONFIG,
+                    pool_size=config.DB_POOL_SIZE,
+                    max_overflow=config.DB_POOL_MAX_OVERFLOW,
+                    recycle=config.DB_POOL_RECYCLE,
+                    timeout=config.DB_POOL_TIMEOUT
+                )
+    return _pool
+
+
+def set_pool(pool):
+    """Reemplazar el pool compartido (p. ej. por uno contra otra base de datos en benchmarks)"""
+    global _pool
+    with _pool_lock:
+        old_pool, _pool = _pool, pool
+    if old_pool is not None:
+        old_pool.close_all()
+
+
+class ReplicaSet:
+    """
+    Pools de las réplicas de lectura. Elige una réplica sana en round-robin o la
+    menos ocupada; una réplica que falla queda fuera `retry_after` segundos.
+    """
+
+    def __init__(self, pools, strategy='round_robin', retry_after=30):
+        self.pools = pools
+        self.strategy = strategy
+        self.retry_after = retry_after
+        self._down_until = {}  # índice -> instante en que se vuelve a probar
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def choose(self):
+        """Una réplica sana, o None si no hay ninguna disponible"""
+        now = time.monotonic()
+        with self._lock:
+            healthy = [i for i in range(len(self.pools)) if self._down_until.get(i, 0) <= now]
+            if not healthy:
+                return None
+            if self.strategy == 'least_busy':
+                index = min(healthy, key=lambda i: self.pools[i].in_use)
+            else:
+                index = healthy[self._next % len(healthy)]
+                self._next += 1
+        return self.pools[index]
+
+    def mark_down(self, pool):
+        with self._lock:
+            index = self.pools.index(pool)
+            self._down_until[index] = time.monotonic() + self.retry_after
+        logger.warning("⚠️ Réplica %s:%s fuera de servicio por %ss",
+                       pool.connect_args.get('host'), pool.connect_args.get('port'), self.retry_after)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            down = dict(self._down_until)
+        return [
+            dict(pool.stats(), host=pool.connect_args.get('host'), port=pool.connect_args.get('port'),
+                 healthy=down.get(i, 0) <= now)
+            for i, pool in enumerate(self.pools)
+        ]
+
+
+_replicas = None
+
+
+def get_replicas():
+    """Réplicas configuradas en config.DB_REPLICAS (None si no hay)"""
+    global _replicas
+    if _replicas is None and config.DB_REPLICAS:
+        with _pool_lock:
+            if _replicas is None:
+                pools = [
+                    ConnectionPool(
+                        dict(config.DB_CONFIG, host=host, port=port),
+                        pool_size=config.DB_POOL_SIZE,
+                        max_overflow=config.DB_POOL_MAX_OVERFLOW,
+                        recycle=config.DB_POOL_RECYCLE,
+                        timeout=config.DB_POOL_TIMEOUT
+                    )
+                    for host, port in config.DB_REPLICAS
+                ]
+                _replicas = ReplicaSet(pools, config.DB_REPLICA_STRATEGY, config.DB_REPLICA_RETRY_SECONDS)
+    return _replicas
+
+
+class Routing:
+    """Estado de enrutamiento de un request: si debe leer del primario y si escribió"""
+
+    def __init__(self, primary=False):
+        self.primary = primary
+        self.wrote = False
+
+
+_routing = contextvars.ContextVar('db_routing', default=None)
+
+
+def begin_routing(primary=False):
+    """
+    Comienza el enrutamiento de un request. Con `primary=True` (sesión que escribió
+    hace poco) todas las lecturas van al primario para leer sus propias escrituras.
+    """
+    routing = Routing(primary)
+    _routing.set(routing)
+    return routing
+
+
+def current_routing():
+    return _routing.get()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Pool de hilos compartido para ejecutar consultas independientes en paralelo"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=config.DB_FANOUT_WORKERS,
+                                               thread_name_prefix='db-fanout')
+    return _executor
+
+
 class Database:
     def __init__(self):
-        self.connection = None
-        self.connect()
-    
+        self.pool = get_pool()
+
     def connect(self):
-        """Conectar a la base de datos MySQL"""
+        """Devuelve el pool de conexiones compartido"""
+        return self.pool
+
+    def disconnect(self):
+        """Cerrar las conexiones inactivas del pool compartido y de las réplicas"""
+        self.pool.close_all()
+        replicas = get_replicas()
+        for pool in (replicas.pools if replicas else []):
+            pool.close_all()
+
+    def _acquire(self, read, primary=False):
+        """
+        Toma una conexión: las lecturas van a una réplica sana (salvo que el request
+        esté fijado al primario o ya haya escrito) y todo lo demás al primario. Si no
+        se puede conectar a la réplica, la lectura cae al primario.
+        :param primary: forzar el primario aunque sea una lectura
+        :return: (pool, conexión)
+        """
+        routing = _routing.get()
+        if not read:
+            if routing is not None:
+                routing.wrote = True
+        elif not primary and (routing is None or not (routing.primary or routing.wrote)):
+            replicas = get_replicas()
+            replica = replicas.choose() if replicas else None
+            if replica is not None:
+                try:
+                    return replica, replica.acquire()
+                except PoolTimeoutError as e:
+                    # réplica saturada pero sana: no se marca caída
+                    logger.warning("⚠️ Réplica sin conexiones libres, se lee del primario: %s", e)
+                except Error as e:
+                    logger.error("❌ Error conectando a réplica: %s", e)
+                    replicas.mark_down(replica)
+        return self.pool, self.pool.acquire()
+
+    @contextmanager
+    def connection(self, read=False, primary=False):
+        """
+        Tomar una conexión del pool durante un bloque `with` y devolverla al salir.
+        :param read: True si solo se va a leer (puede ir a una réplica)
+        :param primary: forzar el primario aunque sea una lectura
+        :raises ReplicaError: si la conexión era de una réplica y se cortó
+        """
+        pool, connection = self._acquire(read, primary)
+        discard = False
         try:
-            if self.connection is None or not self.connection.is_connected():
-                self.connection = mysql.connector.connect(
-                    host='localhost',
-                    database='seguros_santiago_2',
-                    user='root',
-                    password='Marce_75',
-                    autocommit=True  # 👈 habilitamos autocommit para evitar problemas
-                )
-                logger.info("✅ Conexión a MySQL exitosa")
-            return self.connection
+            yield connection
+        except (InterfaceError, OperationalError) as e:
+            discard = True  # conexión rota: no se devuelve al pool
+            if pool is not self.pool:
+                get_replicas().mark_down(pool)
+                raise ReplicaError(msg=e.msg, errno=e.errno) from e
+            raise
+        finally:
+            pool.release(connection, discard=discard)
+
+    def pool_stats(self):
+        stats = self.pool.stats()
+        replicas = get_replicas()
+        if replicas:
+            stats['replicas'] = replicas.stats()
+        if config.DB_PREPARED_STATEMENTS:
+            stats['prepared_statements'] = StatementCache.hit_rate()
+        return stats
+
+    def gather(self, calls, timeout=None):
+        """
+        Ejecutar en paralelo llamadas independientes a la capa de datos y esperar todas.
+        Cada llamada toma su propia conexión del pool, así que la latencia total es
+        la de la consulta más lenta y no la suma de todas.
+        :param calls: dict nombre -> función sin argumentos
+        :param timeout: segundos máximos de espera por cada resultado
+        :return: dict nombre -> resultado (las excepciones se propagan)
+        """
+        if config.DB_FANOUT_WORKERS <= 0 or len(calls) <= 1:
+            return {name: call() for name, call in calls.items()}
+
+        executor = get_executor()
+        # cada llamada lleva una copia del contexto para que sus consultas se asocien al request
+        futures = {name: executor.submit(contextvars.copy_context().run, call) for name, call in calls.items()}
+        timeout = timeout or config.DB_FANOUT_TIMEOUT
+        return {name: future.result(timeout=timeout) for name, future in futures.items()}
+
+    @staticmethod
+    def _statement_cache(connection):
+        """Caché de sentencias preparadas asociada a la conexión (se crea en el primer uso)"""
+        cache = getattr(connection, '_statement_cache', None)
+        if cache is None:
+            cache = StatementCache(connection, config.DB_STATEMENT_CACHE_SIZE)
+            connection._statement_cache = cache
+        return cache
+
+    def _execute_prepared(self, connection, query, params, fetch, one, compact=False):
+        """execute_query sobre una sentencia preparada y cacheada en la conexión"""
+        cache = self._statement_cache(connection)
+        sql, cursor = cache.get(query)
+        try:
+            cursor.execute(sql, params or ())
+            if not fetch:
+                return True
+            if not returns_rows(sql):
+                return cursor.rowcount > 0
+            # se leen todas las filas para dejar el cursor listo para la próxima ejecución
+            columns = cursor.column_names
+            if compact:
+                rows = compact_rows(columns, cursor.fetchall())
+            else:
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            if one:
+                return rows[0] if rows else None
+            return rows
+        except Exception:
+            cache.discard(query)
+            raise
+
+    @contextmanager
+    def transaction(self):
+        """
+        Bloque transaccional sobre una conexión del pool: entrega un cursor (que
+        registra cada sentencia en metrics), hace commit al salir sin errores y
+        rollback si se produce una excepción.
+        """
+        with self.connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            try:
+                connection.start_transaction()
+                yield TimedCursor(cursor)
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def stream_query(self, query, params=None, batch_size=1000, compact=False):
+        """
+        Recorrer el resultado de un SELECT por lotes con un cursor sin buffer,
+        de modo que las filas se van leyendo del servidor a medida que se consumen.
+        La conexión queda tomada del pool hasta agotar o cerrar el generador.
+        :param compact: entregar Record en vez de dict
+        :return: generador de listas de filas (dict | Record)
+        """
+        pool, connection = self._acquire(read=True)
+        cursor = None
+        exhausted = False
+        try:
+            cursor = connection.cursor(dictionary=not compact, buffered=False)
+            started = time.perf_counter()
+            cursor.execute(query, params or ())
+            metrics.record_query(query, time.perf_counter() - started)
+            record = record_class(tuple(cursor.column_names)) if compact else None
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [record(row) for row in rows] if compact else rows
+            exhausted = True
         except Error as e:
-            logger.error(f"❌ Error conectando a MySQL: {e}")
-            return None
-    
-    def disconnect(self):
-        """Cerrar la conexión con la base de datos"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            logger.info("🔌 Conexión a MySQL cerrada")
-            self.connection = None
-    
-    def execute_query(self, query, params=None, fetch=True, one=False):
+            logger.error("❌ Error en consulta SQL: %s", e, extra={'fields': {'query': query, 'params': params}})
+            raise
+        finally:
+            if exhausted:
+                cursor.close()
+            # si el consumidor abandonó el recorrido quedan filas sin leer: se descarta la conexión
+            pool.release(connection, discard=not exhausted)
+
+    def execute_write(self, query, work):
         """
-        Ejecutar consultas SQL con manejo de errores.
-        :param query: SQL query
-        :param params: parámetros de la query
-        :param fetch: True si se requiere fetch
-        :param one: True si se espera un solo resultado
-        :return: dict | list | bool
+        Ejecutar work(cursor) dentro de transaction(), para escrituras de varias sentencias
+        que deben confirmarse juntas (la fila y sus estadísticas, por ejemplo).
+        :param query: sentencia principal, con la que se registra el error en el log
+        :param work: función que recibe el cursor de la transacción
+        :return: resultado de work | False si hubo error (la transacción se revierte)
         """
         try:
-            if not self.connection or not self.connection.is_connected():
-                self.connect()
-            
-            cursor = self.connection.cursor(dictionary=True)
+            with self.transaction() as cursor:
+                return work(cursor)
+
+        except Error as e:
+            logger.error("❌ Error en consulta SQL: %s", e, extra={'fields': {'query': query}})
+            return False
+        except Exception as e:
+            logger.error("⚠️ Error inesperado: %s", e)
+            return False
+
+    def _run_query(self, connection, query, params, fetch, one, compact):
+        if config.DB_PREPARED_STATEMENTS:
+            return self._execute_prepared(connection, query, params, fetch, one, compact)
+
+        # con `one` se usa cursor buffered para no dejar filas sin leer en la conexión
+        cursor = connection.cursor(dictionary=not compact, buffered=one)
+        try:
             cursor.execute(query, params or ())
-            
+
             result = None
             if fetch:
-                if query.strip().upper().startswith("SELECT"):
+                if returns_rows(query):
                     if one:
                         result = cursor.fetchone()  # 👈 trae solo un registro
                     else:
                         result = cursor.fetchall()
+                    if compact:
+                        record = record_class(tuple(cursor.column_names))
+                        if one:
+                            result = record(result) if result is not None else None
+                        else:
+                            result = [record(row) for row in result]
                 else:
                     result = cursor.rowcount > 0
             else:
                 result = True
-
+        finally:
             cursor.close()
-            return result
+        return result
+
+    def execute_query(self, query, params=None, fetch=True, one=False, compact=False):
+        """
+        Ejecutar consultas SQL con manejo de errores.
+        :param query: SQL query
+        :param params: parámetros de la query
+        :param fetch: True si se requiere fetch
+        :param one: True si se espera un solo resultado
+        :param compact: filas como Record (tupla + índice compartido) en vez de dict
+        :return: dict | Record | list | bool
+        """
+        started = time.perf_counter()
+        read = returns_rows(query)
+        try:
+            try:
+                with self.connection(read=read) as connection:
+                    return self._run_query(connection, query, params, fetch, one, compact)
+            except ReplicaError as e:
+                # la réplica se cortó a mitad de la lectura: se reintenta una vez en el primario
+                logger.warning("⚠️ Lectura fallida en réplica, se reintenta en el primario: %s", e)
+                with self.connection(read=read, primary=True) as connection:
+                    return self._run_query(connection, query, params, fetch, one, compact)
 
         except Error as e:
-            logger.error(f"❌ Error en consulta SQL: {e}")
-            logger.error(f"   Query: {query}")
-            logger.error(f"   Params: {params}")
+            logger.error("❌ Error en consulta SQL: %s", e, extra={'fields': {'query': query, 'params': params}})
             return False
         except Exception as e:
-            logger.error(f"⚠️ Error inesperado: {e}")
+            logger.error("⚠️ Error inesperado: %s", e)
             return False
+        finally:
+            metrics.record_query(query, time.perf_counter() - started)
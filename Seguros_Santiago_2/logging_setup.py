@@ -0,0 +1,136 @@
+"""
+Logging asíncrono y estructurado.
+
+Los hilos de los requests solo encolan el LogRecord (sin formatearlo); un hilo
+QueueListener lo formatea como JSON y lo escribe. Si la cola se llena, los
+registros nuevos se descartan y se cuentan en vez de bloquear al request.
+Los eventos de nivel INFO/DEBUG de cada logger se pueden muestrear con
+LOG_SAMPLE_RATES; WARNING y superiores nunca se muestrean.
+
+Los campos estructurados de un evento se pasan en extra={'fields': {...}}.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+import config
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener = None
+_handler = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por evento: ts, level, logger, msg y los campos de extra['fields']"""
+
+    def format(self, record):
+        payload = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            payload.update(fields)
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Deja pasar una fracción de los eventos INFO/DEBUG según el logger (o su ancestro más cercano)"""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates)
+
+    def rate_for(self, name):
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        return random.random() < self.rate_for(record.name)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler que nunca espera: con la cola llena descarta el registro.
+    Tampoco formatea en el hilo que loguea; el mensaje se arma en el listener
+    (la cola es en memoria, así que no hace falta serializar el registro).
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(level=None, fmt=None, sample_rates=None, queue_size=None):
+    """
+    Reemplaza los handlers del logger raíz por un NonBlockingQueueHandler y arranca
+    el listener que escribe en stderr. Se puede llamar más de una vez (reconfigura).
+    """
+    global _listener, _handler
+    level = level or config.LOG_LEVEL
+    fmt = fmt or config.LOG_FORMAT
+    sample_rates = config.LOG_SAMPLE_RATES if sample_rates is None else sample_rates
+    queue_size = queue_size or config.LOG_QUEUE_SIZE
+
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+
+        output = logging.StreamHandler(sys.stderr)
+        output.setFormatter(JsonFormatter() if fmt == 'json' else logging.Formatter(TEXT_FORMAT))
+
+        _handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+        _handler.addFilter(SamplingFilter(sample_rates))
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(_handler)
+        root.setLevel(level)
+
+        _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+        _listener.start()
+
+
+def shutdown():
+    """Vaciar la cola y detener el listener (se registra con atexit)"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def stats():
+    if _handler is None:
+        return {'configurado': False}
+    return {'configurado': True, 'en_cola': _handler.queue.qsize(), 'descartados': _handler.dropped}
+
+
+atexit.register(shutdown)
@@ -0,0 +1,166 @@
+import contextvars
+import logging
+import re
+import threading
+import time
+from functools import lru_cache
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Límites (segundos) de los buckets de los histogramas
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:(?:%s|\?)\s*,\s*)+(?:%s|\?)\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+# Listas que arma la aplicación según la llamada (proyecciones por campos, SET con las columnas que cambiaron)
+_SELECT_LIST = re.compile(r"^SELECT (?:DISTINCT )?.*? FROM ", re.IGNORECASE)
+_SET_LIST = re.compile(r"^(UPDATE \S+ SET ).*?( WHERE )", re.IGNORECASE)
+
+# Etiqueta que reciben las observaciones nuevas cuando un histograma llegó a su máximo de series
+OVERFLOW_LABEL = 'otras'
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(query):
+    """
+    Forma normalizada de una sentencia: sin literales, espacios colapsados, listas IN
+    compactadas y sin la lista de columnas del SELECT ni la del SET de un UPDATE, para
+    que las proyecciones y actualizaciones parciales no creen una serie por variante.
+    """
+    normalized = _STRING_LITERAL.sub('?', query)
+    normalized = _NUMBER_LITERAL.sub('?', normalized)
+    normalized = normalized.replace('%s', '?')
+    normalized = _PLACEHOLDER_LIST.sub('(...)', normalized)
+    normalized = _WHITESPACE.sub(' ', normalized).strip()
+    normalized = _SELECT_LIST.sub('SELECT ... FROM ', normalized, count=1)
+    return _SET_LIST.sub(r'\1...\2', normalized, count=1)
+
+
+class Histogram:
+    """Histograma acumulativo al estilo Prometheus, con una serie por combinación de etiquetas"""
+
+    def __init__(self, name, help_text, label_names, buckets=BUCKETS, max_series=None):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.max_series = max_series  # con el máximo alcanzado, lo nuevo va a la serie OVERFLOW_LABEL
+        self._series = {}  # etiquetas -> [conteos por bucket, suma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                if self.max_series and len(self._series) >= self.max_series:
+                    labels = (OVERFLOW_LABEL,) * len(self.label_names)
+                    series = self._series.get(labels)
+                if series is None:
+                    series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+            for labels, (counts, total, count) in items:
+                base = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+                sep = ',' if base else ''
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {bucket_count}')
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {count}')
+                lines.append(f'{self.name}_sum{{{base}}} {total}')
+                lines.append(f'{self.name}_count{{{base}}} {count}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+QUERY_SECONDS = Histogram('seguros_db_query_seconds',
+                          'Duración de cada consulta SQL por sentencia normalizada',
+                          ('statement',), max_series=config.METRICS_MAX_STATEMENTS)
+ROUTE_QUERY_SECONDS = Histogram('seguros_db_route_query_seconds',
+                                'Duración de cada consulta SQL por ruta',
+                                ('route',))
+REQUEST_SECONDS = Histogram('seguros_request_seconds',
+                            'Duración total de cada request por ruta',
+                            ('route',))
+REQUEST_DB_SECONDS = Histogram('seguros_request_db_seconds',
+                               'Tiempo en base de datos de cada request por ruta',
+                               ('route',))
+REQUEST_QUERIES = Histogram('seguros_request_queries',
+                            'Cantidad de consultas SQL por request y ruta',
+                            ('route',), buckets=(1, 2, 3, 5, 10, 20, 50, 100))
+
+
+class RequestStats:
+    """Consultas y tiempo de base de datos acumulados durante un request"""
+
+    def __init__(self, route):
+        self.route = route
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self._lock = threading.Lock()  # las consultas de Database.gather corren en otros hilos
+
+    def add(self, seconds):
+        with self._lock:
+            self.queries += 1
+            self.db_time += seconds
+
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+def start_request(route):
+    """Comienza a acumular métricas para el request actual"""
+    stats = RequestStats(route)
+    _current.set(stats)
+    return stats
+
+
+def current_request():
+    return _current.get()
+
+
+def finish_request():
+    """Registra las métricas del request actual y las devuelve"""
+    stats = _current.get()
+    if stats is None:
+        return None
+    _current.set(None)
+    REQUEST_SECONDS.observe((stats.route,), time.perf_counter() - stats.started)
+    REQUEST_DB_SECONDS.observe((stats.route,), stats.db_time)
+    REQUEST_QUERIES.observe((stats.route,), stats.queries)
+    return stats
+
+
+def record_query(query, seconds):
+    """Registrar una consulta ejecutada por la capa de datos"""
+    statement = fingerprint(query)
+    stats = _current.get()
+    route = stats.route if stats else 'sin_request'
+    if stats:
+        stats.add(seconds)
+    QUERY_SECONDS.observe((statement,), seconds)
+    ROUTE_QUERY_SECONDS.observe((route,), seconds)
+    if seconds * 1000 >= config.METRICS_SLOW_QUERY_MS:
+        logger.warning("Consulta lenta: %.1f ms en %s - %s", seconds * 1000, route, statement)
+
+
+def render():
+    """Todas las métricas en formato de texto de Prometheus"""
+    lines = []
+    for histogram in (REQUEST_SECONDS, REQUEST_DB_SECONDS, REQUEST_QUERIES, ROUTE_QUERY_SECONDS, QUERY_SECONDS):
+        lines.extend(histogram.render())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,112 @@
+import argparse
+import logging
+import os
+import re
+
+from mysql.connector import Error
+
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+# Errores de MySQL que indican que el cambio ya existe en la base (creado a mano):
+# 1060 columna duplicada, 1061 nombre de índice duplicado
+ALREADY_APPLIED_ERRNOS = {1060, 1061}
+
+SCHEMA_MIGRATIONS = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT UNSIGNED NOT NULL PRIMARY KEY,
+        nombre VARCHAR(255) NOT NULL,
+        aplicada_en TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """Migraciones del directorio como lista ordenada de (versión, nombre, ruta)"""
+    migrations = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    migrations.sort()
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError("Hay dos migraciones con el mismo número de versión")
+    return migrations
+
+
+def split_statements(sql):
+    """Sentencias de un archivo .sql, sin comentarios de línea"""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [statement.strip() for statement in '\n'.join(lines).split(';') if statement.strip()]
+
+
+class Migrator:
+    """Aplica en orden las migraciones pendientes y las registra en schema_migrations"""
+
+    def __init__(self, db=None, directory=MIGRATIONS_DIR):
+        self.db = db or Database()
+        self.directory = directory
+
+    def applied_versions(self):
+        with self.db.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(SCHEMA_MIGRATIONS)
+                cursor.execute("SELECT version FROM schema_migrations")
+                return {row[0] for row in cursor.fetchall()}
+            finally:
+                cursor.close()
+
+    def pending(self):
+        applied = self.applied_versions()
+        return [m for m in discover(self.directory) if m[0] not in applied]
+
+    def apply(self, version, name, path):
+        """Ejecuta una migración sentencia por sentencia (el DDL de MySQL no es transaccional)"""
+        with open(path, encoding='utf-8') as f:
+            statements = split_statements(f.read())
+
+        with self.db.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                for statement in statements:
+                    try:
+                        cursor.execute(statement)
+                    except Error as e:
+                        if e.errno not in ALREADY_APPLIED_ERRNOS:
+                            raise
+                        logger.warning("⚠️ %03d_%s: ya existe, se omite (%s)", version, name, e.msg)
+                cursor.execute("INSERT INTO schema_migrations (version, nombre) VALUES (%s, %s)", (version, name))
+            finally:
+                cursor.close()
+        logger.info("✅ Migración aplicada: %03d_%s", version, name)
+
+    def migrate(self):
+        """Aplica todas las pendientes; se detiene en la primera que falla"""
+        pending = self.pending()
+        for migration in pending:
+            self.apply(*migration)
+        return pending
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Migraciones de esquema e índices de seguros_santiago_2")
+    parser.add_argument('--status', action='store_true', help="mostrar migraciones aplicadas y pendientes")
+    parser.add_argument('--dry-run', action='store_true', help="listar las pendientes sin aplicarlas")
+    args = parser.parse_args()
+
+    migrator = Migrator()
+    if args.status or args.dry_run:
+        applied = migrator.applied_versions()
+        for version, name, _ in discover():
+            state = 'aplicada' if version in applied else 'pendiente'
+            print(f"{version:03d}_{name}: {state}")
+    else:
+        done = migrator.migrate()
+        print(f"Migraciones aplicadas: {len(done)}" if done else "La base de datos está al día")
@@ -0,0 +1,3 @@
+-- Contador de versión de cada cliente: lo incrementa cada UPDATE de la aplicación
+-- y se usa como ETag en las vistas y la API del cliente.
+ALTER TABLE Clientes ADD COLUMN version INT UNSIGNED NOT NULL DEFAULT 1;
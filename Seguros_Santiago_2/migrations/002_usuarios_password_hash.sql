@@ -0,0 +1,3 @@
+-- Espacio para el hash 'pbkdf2_sha256$iteraciones$sal$hash' (~90 caracteres).
+-- Las contraseñas en texto plano existentes se rehashean en el siguiente login.
+ALTER TABLE Usuarios MODIFY password VARCHAR(255) NOT NULL;
@@ -0,0 +1,8 @@
+-- Índices que necesitan las búsquedas puntuales de la aplicación:
+-- login por nombre de usuario o correo, cliente/agente por usuario y cliente por RUT
+-- (con id_cliente para que también sirva al orden por RUT de la lista de clientes).
+CREATE UNIQUE INDEX ux_usuarios_nombre_usuario ON Usuarios (nombre_usuario);
+CREATE UNIQUE INDEX ux_usuarios_correo_electronico ON Usuarios (correo_electronico);
+CREATE INDEX ix_clientes_id_usuario ON Clientes (id_usuario);
+CREATE INDEX ix_agentes_id_usuario ON Agentes (id_usuario);
+CREATE INDEX ix_clientes_rut_id ON Clientes (rut, id_cliente);
@@ -0,0 +1,13 @@
+-- Índices de la lista de clientes (get_clients_page), señalados por query_plans.py.
+-- Cada orden por keyset usa un índice (columna, id_cliente): ORDER BY columna, id_cliente
+-- y el cursor `columna > %s OR (columna = %s AND id_cliente > %s)` (con < en orden
+-- descendente) se resuelven recorriendo el índice desde la posición del cursor, sin
+-- filesort, así que la página N cuesta lo mismo que la primera (el orden por RUT usa
+-- ix_clientes_rut_id de 003). Cada filtro recorre (columna, id_cliente) en orden de id;
+-- InnoDB agrega la PK al final de cada índice.
+CREATE INDEX ix_clientes_codigo_cliente_id ON Clientes (codigo_cliente, id_cliente);
+CREATE INDEX ix_clientes_nombre_id ON Clientes (nombre, id_cliente);
+CREATE INDEX ix_clientes_apellido_id ON Clientes (apellido, id_cliente);
+CREATE INDEX ix_clientes_id_tipo_seguro ON Clientes (id_tipo_seguro);
+CREATE INDEX ix_clientes_id_clasificacion_sistema ON Clientes (id_clasificacion_sistema);
+CREATE INDEX ix_clientes_id_clasificacion_agente ON Clientes (id_clasificacion_agente);
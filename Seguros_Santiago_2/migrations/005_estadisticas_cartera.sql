@@ -0,0 +1,14 @@
+-- Estadísticas de cartera precalculadas (portfolio_stats.py): una fila por
+-- (dimension, clave) que CRUDModel mantiene en la misma transacción que cada
+-- escritura de Clientes. Después de aplicarla hay que poblarla con
+--   python portfolio_stats.py --rebuild
+-- clientes es con signo para que un desfase no haga fallar las escrituras;
+-- portfolio_stats.py --verify lo detecta.
+CREATE TABLE IF NOT EXISTS Estadisticas_Cartera (
+    dimension VARCHAR(32) NOT NULL,
+    clave VARCHAR(32) NOT NULL,
+    clientes INT NOT NULL DEFAULT 0,
+    carga_familiar BIGINT NOT NULL DEFAULT 0,
+    ingresos_anuales DECIMAL(20, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, clave)
+);
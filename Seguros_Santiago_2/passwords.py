@@ -0,0 +1,121 @@
+import base64
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+
+import config
+
+ALGORITHM = 'pbkdf2_sha256'
+
+_default_verifier = None
+_default_lock = threading.Lock()
+
+
+class PasswordBusyError(Exception):
+    """El pool de verificación está saturado o no respondió a tiempo"""
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _unb64(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def hash_password(password, iterations=None):
+    """Hash con sal aleatoria: 'pbkdf2_sha256$iteraciones$sal$hash'"""
+    iterations = iterations or config.PASSWORD_HASH_ITERATIONS
+    salt = os.urandom(16)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    return f"{ALGORITHM}${iterations}${_b64(salt)}${_b64(digest)}"
+
+
+@lru_cache(maxsize=None)
+def dummy_hash(iterations=None):
+    """
+    Hash de una contraseña aleatoria con el costo configurado. El login lo verifica
+    cuando el usuario no existe, para que el tiempo de respuesta no revele qué
+    nombres de usuario están registrados.
+    """
+    return hash_password(_b64(os.urandom(16)), iterations)
+
+
+def is_hashed(stored):
+    return bool(stored) and stored.startswith(ALGORITHM + '$')
+
+
+def check_password(password, stored):
+    """
+    Compara la contraseña con lo almacenado. Las filas antiguas guardan la
+    contraseña en texto plano; se aceptan para poder rehashearlas en el login.
+    """
+    if not stored:
+        return False
+    if not is_hashed(stored):
+        # mismo costo que una fila con hash, para que el tiempo no distinga las filas antiguas
+        check_password(password, dummy_hash())
+        return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8'))
+    try:
+        _, iterations, salt, digest = stored.split('$')
+        candidate = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), _unb64(salt), int(iterations))
+    except ValueError:
+        return False
+    return hmac.compare_digest(candidate, _unb64(digest))
+
+
+def needs_rehash(stored):
+    """True si está en texto plano o con un costo menor al configurado"""
+    if not is_hashed(stored):
+        return True
+    try:
+        return int(stored.split('$')[1]) < config.PASSWORD_HASH_ITERATIONS
+    except (IndexError, ValueError):
+        return True
+
+
+class PasswordVerifier:
+    """
+    Ejecuta el hashing en un pool de hilos acotado (pbkdf2 libera el GIL), para que
+    los picos de login no ocupen los hilos que atienden las demás rutas. Si hay más
+    de `max_queue` trabajos pendientes, o uno tarda más de `timeout`, se rechaza.
+    """
+
+    def __init__(self, workers=None, max_queue=None, timeout=None):
+        workers = workers or config.PASSWORD_WORKERS
+        self.timeout = timeout or config.PASSWORD_VERIFY_TIMEOUT
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password')
+        self._slots = threading.BoundedSemaphore(workers + (max_queue if max_queue is not None
+                                                            else config.PASSWORD_MAX_QUEUE))
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordBusyError("Cola de verificación de contraseñas llena")
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise PasswordBusyError("Tiempo de espera agotado verificando la contraseña")
+
+    def verify(self, password, stored):
+        return self._run(check_password, password, stored)
+
+    def hash(self, password):
+        return self._run(hash_password, password)
+
+
+def default_verifier():
+    """PasswordVerifier compartido por todo el proceso (login, rehash y alta de usuarios)"""
+    global _default_verifier
+    with _default_lock:
+        if _default_verifier is None:
+            _default_verifier = PasswordVerifier()
+        return _default_verifier
@@ -0,0 +1,202 @@
+"""
+Estadísticas de la cartera precalculadas en la tabla Estadisticas_Cartera.
+
+Una fila por (dimension, clave) con la cantidad de clientes y las sumas de carga
+familiar e ingresos anuales. Cada escritura de Clientes que hace CRUDModel aplica
+su delta a esta tabla en la misma transacción, así los dashboards leen números
+ya calculados en vez de agregar sobre Clientes. rebuild() la recalcula completa
+y verify() la compara contra un agregado de Clientes.
+"""
+import argparse
+import bisect
+import logging
+from decimal import Decimal
+
+import config
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+# Dimensiones de la tabla: nombre -> columna de Clientes (None = se calcula)
+DIMENSIONS = {
+    'total': None,
+    'tipo_seguro': 'id_tipo_seguro',
+    'clasificacion_sistema': 'id_clasificacion_sistema',
+    'clasificacion_agente': 'id_clasificacion_agente',
+    'banda_ingresos': None,
+}
+
+# Columnas de Clientes que afectan las estadísticas
+STATS_FIELDS = ('id_tipo_seguro', 'id_clasificacion_sistema', 'id_clasificacion_agente',
+                'ingresos_anuales', 'carga_familiar')
+
+# Clave de la fila 'total' y de los clientes sin valor en una dimensión
+NO_VALUE = ''
+
+UPSERT = """
+    INSERT INTO Estadisticas_Cartera (dimension, clave, clientes, carga_familiar, ingresos_anuales)
+    VALUES {values}
+    ON DUPLICATE KEY UPDATE
+        clientes = clientes + VALUES(clientes),
+        carga_familiar = carga_familiar + VALUES(carga_familiar),
+        ingresos_anuales = ingresos_anuales + VALUES(ingresos_anuales)
+"""
+
+
+def _decimal(value):
+    return None if value in (None, '') else Decimal(str(value))
+
+
+def income_band(value, bands=None):
+    """Clave de la banda de ingresos: el límite inferior de la banda como texto"""
+    bands = bands or config.STATS_INCOME_BANDS
+    value = _decimal(value)
+    if value is None:
+        return NO_VALUE
+    return str(bands[max(bisect.bisect_right(bands, value) - 1, 0)])
+
+
+def row_keys(row):
+    """Claves (dimension, clave) en las que cuenta un cliente"""
+    keys = [('total', NO_VALUE), ('banda_ingresos', income_band(row.get('ingresos_anuales')))]
+    for dimension, column in DIMENSIONS.items():
+        if column:
+            value = row.get(column)
+            keys.append((dimension, NO_VALUE if value in (None, '') else str(int(value))))
+    return keys
+
+
+class StatsDelta:
+    """Cambios acumulados por (dimension, clave): [clientes, carga_familiar, ingresos_anuales]"""
+
+    def __init__(self):
+        self.changes = {}
+
+    def add(self, row, sign=1):
+        carga = _decimal(row.get('carga_familiar')) or 0
+        ingresos = _decimal(row.get('ingresos_anuales')) or 0
+        for key in row_keys(row):
+            totals = self.changes.setdefault(key, [0, 0, 0])
+            totals[0] += sign
+            totals[1] += sign * carga
+            totals[2] += sign * ingresos
+        return self
+
+    def remove(self, row):
+        return self.add(row, -1)
+
+    def move(self, old, new):
+        """Un cliente que pasa de la fila `old` a la fila `new` (los deltas que se anulan desaparecen)"""
+        return self.remove(old).add(new)
+
+    def rows(self):
+        """Deltas distintos de cero, ordenados por clave para bloquear siempre en el mismo orden"""
+        return [(dimension, clave, clientes, int(carga), ingresos)
+                for (dimension, clave), (clientes, carga, ingresos) in sorted(self.changes.items())
+                if clientes or carga or ingresos]
+
+    def apply(self, cursor):
+        """Sumar los deltas a Estadisticas_Cartera con el cursor de la transacción en curso"""
+        rows = self.rows()
+        if rows:
+            cursor.execute(UPSERT.format(values=', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))),
+                           tuple(value for row in rows for value in row))
+        return len(rows)
+
+
+def aggregate_query(bands=None):
+    """Las filas de Estadisticas_Cartera calculadas directamente sobre Clientes"""
+    bands = bands or config.STATS_INCOME_BANDS
+    band = ' '.join(f"WHEN ingresos_anuales >= {int(low)} THEN '{int(low)}'" for low in reversed(bands[1:]))
+    band = f"CASE WHEN ingresos_anuales IS NULL THEN '' {band} ELSE '{int(bands[0])}' END"
+    sums = ("COUNT(*) AS clientes, COALESCE(SUM(carga_familiar), 0) AS carga_familiar, "
+            "COALESCE(SUM(ingresos_anuales), 0) AS ingresos_anuales")
+
+    parts = [f"SELECT 'total' AS dimension, '' AS clave, {sums} FROM Clientes"]
+    for dimension, column in DIMENSIONS.items():
+        if column:
+            parts.append(f"SELECT '{dimension}', COALESCE(CAST({column} AS CHAR), ''), {sums} "
+                         f"FROM Clientes GROUP BY {column}")
+    parts.append(f"SELECT 'banda_ingresos', banda, {sums} "
+                 f"FROM (SELECT {band} AS banda, carga_familiar, ingresos_anuales FROM Clientes) b GROUP BY banda")
+    return '\nUNION ALL\n'.join(parts)
+
+
+class PortfolioStats:
+    """Lectura, reconstrucción y verificación de Estadisticas_Cartera"""
+
+    def __init__(self, db=None):
+        self.db = db or Database()
+
+    def read(self):
+        """
+        Estadísticas por dimensión, sin recorrer Clientes.
+        :return: dict dimension -> {clave: {'clientes', 'carga_familiar', 'ingresos_anuales'}} | False si hubo error
+        """
+        rows = self.db.execute_query(
+            "SELECT dimension, clave, clientes, carga_familiar, ingresos_anuales FROM Estadisticas_Cartera"
+        )
+        if rows is False:
+            return False
+        stats = {dimension: {} for dimension in DIMENSIONS}
+        for row in rows:
+            if row['clientes'] or row['dimension'] == 'total':
+                stats.setdefault(row['dimension'], {})[row['clave']] = {
+                    'clientes': row['clientes'],
+                    'carga_familiar': row['carga_familiar'],
+                    'ingresos_anuales': row['ingresos_anuales'],
+                }
+        return stats
+
+    def rebuild(self):
+        """
+        Recalcular la tabla completa en una transacción. El INSERT ... SELECT bloquea
+        las filas de Clientes que lee, así que no se pierde ningún delta concurrente.
+        :return: filas escritas
+        """
+        with self.db.transaction() as cursor:
+            cursor.execute("DELETE FROM Estadisticas_Cartera")
+            cursor.execute("INSERT INTO Estadisticas_Cartera "
+                           "(dimension, clave, clientes, carga_familiar, ingresos_anuales) " + aggregate_query())
+            written = cursor.rowcount
+        logger.info("Estadísticas de cartera reconstruidas - %s filas", written)
+        return written
+
+    def verify(self):
+        """
+        Comparar la tabla con el agregado de Clientes (las filas en cero equivalen a no tenerlas).
+        :return: lista de diferencias {'dimension', 'clave', 'esperado', 'registrado'}
+        """
+        def index(rows):
+            return {(row['dimension'], row['clave']): (int(row['clientes']), int(row['carga_familiar']),
+                                                       Decimal(str(row['ingresos_anuales'])).quantize(Decimal('0.01')))
+                    for row in rows}
+
+        expected = index(self.db.execute_query(aggregate_query()) or [])
+        stored = index(self.db.execute_query(
+            "SELECT dimension, clave, clientes, carga_familiar, ingresos_anuales FROM Estadisticas_Cartera"
+        ) or [])
+        empty = (0, 0, Decimal('0.00'))
+        differences = []
+        for key in sorted(set(expected) | set(stored)):
+            if expected.get(key, empty) != stored.get(key, empty):
+                differences.append({'dimension': key[0], 'clave': key[1],
+                                    'esperado': expected.get(key), 'registrado': stored.get(key)})
+        return differences
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Reconstruir o verificar Estadisticas_Cartera")
+    parser.add_argument('--rebuild', action='store_true', help="recalcular la tabla completa desde Clientes")
+    parser.add_argument('--verify', action='store_true', help="comparar la tabla con Clientes sin escribir")
+    args = parser.parse_args()
+
+    stats = PortfolioStats()
+    if args.rebuild:
+        print(f"Filas escritas: {stats.rebuild()}")
+    if args.verify or not args.rebuild:
+        differences = stats.verify()
+        for diff in differences:
+            print(f"{diff['dimension']}/{diff['clave'] or '-'}: esperado {diff['esperado']}, registrado {diff['registrado']}")
+        print("Estadísticas consistentes" if not differences else f"Diferencias: {len(differences)}")
+        raise SystemExit(1 if differences else 0)
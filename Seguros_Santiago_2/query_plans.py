@@ -0,0 +1,370 @@
+"""
+Revisión de planes de ejecución de todas las sentencias de la aplicación.
+
+Ejecuta los métodos de CRUDModel, AuthSystem y los procesos batch contra una base
+sembrada (la de DB_CONFIG), registra cada sentencia distinta con los parámetros con
+que se emitió y la pasa por EXPLAIN FORMAT=JSON. Falla si alguna hace un scan
+completo o un filesort sobre una tabla grande más allá de los umbrales de config,
+y sugiere los índices que lo evitarían. Las escrituras se registran pero no se
+ejecutan, así que la base sembrada no se modifica.
+
+    python query_plans.py
+    python query_plans.py --json planes.json --max-scan-rows 5000
+"""
+import argparse
+import inspect
+import json
+import logging
+import re
+import sys
+from contextlib import contextmanager
+
+import config
+from auth import AuthSystem
+from classification import ClassificationEngine
+from crud_model import CRUDModel, CLIENT_SORT_COLUMNS, CLIENT_FILTER_COLUMNS, CLIENT_FIELDS
+from database import Database, returns_rows
+from metrics import fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Métodos públicos de CRUDModel que no emiten SQL propio
+NO_SQL_METHODS = {'catalog_calls', 'invalidate_catalogs'}
+
+_TABLE_REF = re.compile(
+    r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)"
+    r"(?:\s+(?:AS\s+)?(?!(?:WHERE|ON|ORDER|GROUP|LIMIT|LEFT|RIGHT|INNER|JOIN|SET|VALUES)\b)(\w+))?",
+    re.IGNORECASE
+)
+_CONDITION_COLUMN = re.compile(r"`(\w+)`\.`(\w+)`\.`(\w+)`")
+_ORDER_BY = re.compile(r"\bORDER BY\s+(.+?)(?:\s+LIMIT\b|$)", re.IGNORECASE | re.DOTALL)
+
+
+class _RecordingCursor:
+    """Cursor de Database.transaction que solo registra las sentencias"""
+
+    def __init__(self, recorder):
+        self._recorder = recorder
+        self._rows = []
+        self.rowcount = 0
+        self.lastrowid = None
+
+    def execute(self, query, params=()):
+        if returns_rows(query):
+            self._rows = self._recorder.execute_query(query, params) or []
+        else:
+            self._recorder.record(query, params)
+            self.rowcount = 1  # como si la escritura afectara una fila, para seguir el camino completo
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def executemany(self, query, seq_params):
+        self._recorder.record(query, seq_params[0] if seq_params else ())
+        self.rowcount = len(seq_params)
+
+
+class StatementRecorder(Database):
+    """
+    Database que anota cada sentencia distinta (por fingerprint) junto con el paso
+    del recorrido que la emitió. Las lecturas se ejecutan de verdad para que el
+    recorrido avance con datos reales; las escrituras solo se anotan.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.step = None
+        self.statements = {}  # fingerprint -> {'query', 'params', 'steps'}
+
+    def record(self, query, params):
+        entry = self.statements.setdefault(fingerprint(query), {'query': query, 'params': params, 'steps': []})
+        if self.step not in entry['steps']:
+            entry['steps'].append(self.step)
+
+    def execute_query(self, query, params=None, fetch=True, one=False, compact=False):
+        self.record(query, params)
+        if not returns_rows(query):
+            return True
+        return super().execute_query(query, params, fetch, one, compact)
+
+    def stream_query(self, query, params=None, batch_size=1000, compact=False):
+        """Solo el primer lote: para el plan basta con emitir la sentencia"""
+        self.record(query, params)
+        rows = super().stream_query(query, params, batch_size, compact)
+        try:
+            first = next(rows, None)
+            if first:
+                yield first
+        finally:
+            rows.close()
+
+    @contextmanager
+    def transaction(self):
+        yield _RecordingCursor(self)
+
+
+def sample_data(db):
+    """Un cliente con usuario asociado de la base sembrada, para parametrizar el recorrido"""
+    client = db.execute_query("""
+        SELECT c.*, u.nombre_usuario, u.correo_electronico AS correo_usuario
+        FROM Clientes c JOIN Usuarios u ON c.id_usuario = u.id_usuario
+        ORDER BY c.id_cliente
+        LIMIT 1
+    """, one=True)
+    if not client:
+        raise RuntimeError("La base no tiene clientes con usuario: siembre datos antes de revisar los planes")
+    return client
+
+
+def workload(crud, auth, sample):
+    """
+    Pasos que emiten todas las sentencias de la aplicación: nombre -> función.
+    Las rutas de app.py solo consultan a través de estos métodos.
+    """
+    client_data = {field: sample[field] for field in CLIENT_FIELDS}
+    # las actualizaciones solo escriben columnas modificadas: se cambia el teléfono
+    edited = dict(client_data, telefono='+56900000000')
+
+    def pages():
+        for sort in CLIENT_SORT_COLUMNS:
+            for direction in ('asc', 'desc'):
+                page = crud.get_clients_page(sort=sort, direction=direction, limit=10)
+                if page and page['next_cursor']:
+                    page = crud.get_clients_page(sort=sort, direction=direction, after=page['next_cursor'], limit=10)
+                    if page and page['prev_cursor']:
+                        crud.get_clients_page(sort=sort, direction=direction, before=page['prev_cursor'], limit=10)
+        for key, column in CLIENT_FILTER_COLUMNS.items():
+            crud.get_clients_page(filters={key: sample[column.split('.', 1)[1]]}, limit=10)
+
+    def stream():
+        for _ in crud.iter_all_clients():
+            pass
+
+    def login():
+        auth.login(sample['nombre_usuario'], '')
+        auth.login(sample['correo_usuario'], '')
+
+    def user_role():
+        auth.invalidate_user(sample['id_usuario'])
+        auth.get_user_role(sample['id_usuario'])
+
+    return {
+        'get_all_clients': crud.get_all_clients,
+        'get_clients_page': pages,
+        'get_client_by_id': lambda: crud.get_client_by_id(sample['id_cliente']),
+        'get_clients_by_ids': lambda: (crud.get_clients_by_ids([sample['id_cliente'], sample['id_cliente'] + 1]),
+                                       crud.get_clients_by_ids([sample['id_cliente']], fields=['nombre', 'rut'])),
+        'get_client_version': lambda: (crud.get_client_version(sample['id_cliente']),
+                                       crud.get_client_version(sample['id_cliente'], sample['id_usuario'])),
+        'iter_all_clients': stream,
+        'get_portfolio_stats': crud.get_portfolio_stats,
+        'get_recent_clients': lambda: crud.get_recent_clients(5),
+        'get_client_by_user_id': lambda: crud.get_client_by_user_id(sample['id_usuario']),
+        'create_client': lambda: crud.create_client(client_data),
+        'create_clients_batch': lambda: crud.create_clients_batch([tuple(client_data[f] for f in CLIENT_FIELDS)]),
+        'update_client': lambda: crud.update_client(sample['id_cliente'], edited, original=sample),
+        'update_client_limited': lambda: crud.update_client_limited(sample['id_cliente'], edited, original=sample),
+        'delete_client': lambda: crud.delete_client(sample['id_cliente']),
+        'bulk_update_clients': lambda: crud.bulk_update_clients([sample['id_cliente']], 'id_clasificacion_agente',
+                                                               (sample['id_clasificacion_agente'] or 0) + 1),
+        'bulk_delete_clients': lambda: crud.bulk_delete_clients([sample['id_cliente']]),
+        'search_clients': lambda: crud.search_clients(sample['apellido']),
+        'get_all_users': crud.get_all_users,
+        'create_user': lambda: crud.create_user({'codigo_usuario': 'PLAN', 'nombre_usuario': 'plan',
+                                                 'correo_electronico': 'plan@example.cl',
+                                                 'password': 'x', 'id_rol': 2}),
+        'get_tipos_seguro': crud.get_tipos_seguro,
+        'get_clasificaciones_sistema': crud.get_clasificaciones_sistema,
+        'get_clasificaciones_agente': crud.get_clasificaciones_agente,
+        'warm_catalogs': crud.warm_catalogs,
+        'login': login,
+        'rehash': lambda: auth._rehash(sample['id_usuario'], 'x'),
+        'get_user_role': user_role,
+        'get_all_users_debug': auth.get_all_users_debug,
+        'recompute_all': lambda: ClassificationEngine().recompute_all(db=crud.db, batch_size=100),
+        'portfolio_stats_verify': crud.stats.verify,
+    }
+
+
+def uncovered_methods(steps):
+    """Métodos públicos de CRUDModel que el recorrido no ejercita"""
+    methods = {name for name, _ in inspect.getmembers(CRUDModel, inspect.isfunction) if not name.startswith('_')}
+    return sorted(methods - set(steps) - NO_SQL_METHODS)
+
+
+def table_aliases(query):
+    """alias (o nombre) -> tabla, según las cláusulas FROM / JOIN de la sentencia"""
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(query):
+        aliases[table] = table
+        if alias:
+            aliases[alias] = table
+    return aliases
+
+
+def _walk(node, filesort=False):
+    """(nodo de tabla, bajo filesort) para cada tabla del plan JSON"""
+    if isinstance(node, dict):
+        filesort = filesort or bool(node.get('using_filesort'))
+        if 'table_name' in node:
+            yield node, filesort
+        for value in node.values():
+            yield from _walk(value, filesort)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _walk(item, filesort)
+
+
+def suggest_index(query, alias, table, table_node, include_order=False):
+    """CREATE INDEX con las columnas del filtro/join sobre la tabla y, si hace falta, las del ORDER BY"""
+    columns = []
+    for _, node_alias, column in _CONDITION_COLUMN.findall(table_node.get('attached_condition', '')):
+        if node_alias == alias and column not in columns:
+            columns.append(column)
+    if include_order:
+        match = _ORDER_BY.search(query)
+        for part in (match.group(1).split(',') if match else ()):
+            expression = re.sub(r"\s+(ASC|DESC)\s*$", '', part.strip(), flags=re.IGNORECASE)
+            prefix, _, column = expression.rpartition('.')
+            if prefix in (alias, '') and column and column not in columns:
+                columns.append(column)
+    if not columns:
+        return None
+    return f"CREATE INDEX ix_{table.lower()}_{'_'.join(columns)} ON {table} ({', '.join(columns)})"
+
+
+def check_plan(query, plan, table_rows, allow_full_scan=False, large_table_rows=None,
+               max_scan_rows=None, max_filesort_rows=None):
+    """
+    Problemas de un plan de EXPLAIN FORMAT=JSON.
+    :param table_rows: tabla -> filas estimadas (information_schema.TABLES)
+    :return: lista de dict con table, problem, rows y suggestion
+    """
+    large_table_rows = config.PLAN_LARGE_TABLE_ROWS if large_table_rows is None else large_table_rows
+    max_scan_rows = config.PLAN_MAX_SCAN_ROWS if max_scan_rows is None else max_scan_rows
+    max_filesort_rows = config.PLAN_MAX_FILESORT_ROWS if max_filesort_rows is None else max_filesort_rows
+    aliases = table_aliases(query)
+    findings = []
+    for node, filesort in _walk(plan):
+        alias = node['table_name']
+        table = aliases.get(alias, alias)
+        if table_rows.get(table.lower(), 0) < large_table_rows:
+            continue
+        rows = int(node.get('rows_examined_per_scan', 0))
+        full_scan = node.get('access_type') in ('ALL', 'index') and rows > max_scan_rows
+        if full_scan and not allow_full_scan:
+            findings.append({'table': table, 'problem': 'full_scan', 'rows': rows,
+                             'suggestion': suggest_index(query, alias, table, node)})
+        if filesort and rows > max_filesort_rows and not (full_scan and allow_full_scan):
+            findings.append({'table': table, 'problem': 'filesort', 'rows': rows,
+                             'suggestion': suggest_index(query, alias, table, node, include_order=True)})
+    return findings
+
+
+def table_sizes(db):
+    rows = db.execute_query("""
+        SELECT TABLE_NAME AS tabla, TABLE_ROWS AS filas
+        FROM information_schema.TABLES
+        WHERE TABLE_SCHEMA = DATABASE()
+    """)
+    return {row['tabla'].lower(): int(row['filas'] or 0) for row in rows or ()}
+
+
+def explain(db, query, params):
+    with db.connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("EXPLAIN FORMAT=JSON " + query, params or ())
+            return json.loads(cursor.fetchone()[0])
+        finally:
+            cursor.close()
+
+
+def run(large_table_rows=None, max_scan_rows=None, max_filesort_rows=None, allow_full_scan=None):
+    """
+    Recorre la aplicación, explica cada sentencia y arma el reporte.
+    :return: dict con statements, uncovered, errors y ok
+    """
+    allow_full_scan = set(config.PLAN_ALLOW_FULL_SCAN if allow_full_scan is None else allow_full_scan)
+    db = Database()
+    recorder = StatementRecorder()
+    crud, auth = CRUDModel(), AuthSystem()
+    crud.db = crud.search_index.db = crud.stats.db = auth.db = recorder
+
+    steps = workload(crud, auth, sample_data(db))
+    errors = []
+    for name, step in steps.items():
+        recorder.step = name
+        try:
+            step()
+        except Exception as e:
+            errors.append({'step': name, 'error': str(e)})
+
+    sizes = table_sizes(db)
+    report = []
+    for key, entry in sorted(recorder.statements.items(), key=lambda item: item[1]['steps']):
+        query = entry['query']
+        item = {'statement': key, 'steps': entry['steps'], 'findings': []}
+        if query.lstrip().upper().startswith('INSERT'):
+            item['skipped'] = 'INSERT sin lectura'
+        else:
+            try:
+                plan = explain(db, query, entry['params'])
+                item['findings'] = check_plan(
+                    query, plan, sizes,
+                    allow_full_scan=all(step in allow_full_scan for step in entry['steps']),
+                    large_table_rows=large_table_rows, max_scan_rows=max_scan_rows,
+                    max_filesort_rows=max_filesort_rows
+                )
+            except Exception as e:
+                errors.append({'step': ', '.join(entry['steps']), 'error': f"EXPLAIN: {e}"})
+        report.append(item)
+
+    uncovered = uncovered_methods(steps)
+    return {
+        'statements': report,
+        'uncovered': uncovered,
+        'errors': errors,
+        'ok': not errors and not uncovered and not any(item['findings'] for item in report),
+    }
+
+
+def print_report(result):
+    flagged = [item for item in result['statements'] if item['findings']]
+    print(f"Sentencias revisadas: {len(result['statements'])}  Con problemas: {len(flagged)}")
+    for item in flagged:
+        print(f"\n✗ [{', '.join(item['steps'])}] {item['statement']}")
+        for finding in item['findings']:
+            print(f"    {finding['problem']} en {finding['table']} (~{finding['rows']} filas)")
+    for name in result['uncovered']:
+        print(f"\n✗ CRUDModel.{name} no está en el recorrido de query_plans.workload")
+    for error in result['errors']:
+        print(f"\n✗ [{error['step']}] {error['error']}")
+
+    suggestions = sorted({f['suggestion'] for item in flagged for f in item['findings'] if f['suggestion']})
+    if suggestions:
+        print("\nÍndices sugeridos:")
+        for suggestion in suggestions:
+            print(f"    {suggestion};")
+    print("\nOK" if result['ok'] else "\nFALLA")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Revisar con EXPLAIN los planes de todas las sentencias de la aplicación")
+    parser.add_argument('--large-table-rows', type=int, default=config.PLAN_LARGE_TABLE_ROWS,
+                        help="filas desde las que una tabla se considera grande")
+    parser.add_argument('--max-scan-rows', type=int, default=config.PLAN_MAX_SCAN_ROWS,
+                        help="filas examinadas por un scan completo antes de fallar")
+    parser.add_argument('--max-filesort-rows', type=int, default=config.PLAN_MAX_FILESORT_ROWS,
+                        help="filas ordenadas con filesort antes de fallar")
+    parser.add_argument('--json', help="escribir también el reporte completo en este archivo")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    result = run(args.large_table_rows, args.max_scan_rows, args.max_filesort_rows)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2, default=str)
+    print_report(result)
+    sys.exit(0 if result['ok'] else 1)
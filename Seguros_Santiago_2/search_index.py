@@ -0,0 +1,241 @@
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Campos del cliente que se indexan y se devuelven en los resultados
+SEARCH_FIELDS = ('codigo_cliente', 'rut', 'nombre', 'apellido', 'correo_electronico')
+
+_RUT_PATTERN = re.compile(r'^[0-9][0-9.\s]*-?\s*[0-9kK]?$')
+_TOKEN_SPLIT = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_rut(value):
+    """'12.345.678-k' -> '12345678K'"""
+    return re.sub(r'[^0-9kK]', '', value or '').upper()
+
+
+def normalize_text(value):
+    """Minúsculas y sin tildes"""
+    value = unicodedata.normalize('NFKD', str(value or '')).encode('ascii', 'ignore').decode()
+    return value.lower()
+
+
+def tokens(client):
+    """Tokens indexables de un cliente: palabras de cada campo y el RUT normalizado"""
+    result = set()
+    for field in SEARCH_FIELDS:
+        if field == 'rut':
+            rut = normalize_rut(client.get('rut'))
+            if rut:
+                result.add(rut.lower())
+            continue
+        result.update(t for t in _TOKEN_SPLIT.split(normalize_text(client.get(field))) if t)
+    return result
+
+
+def trigrams(token):
+    """Trigramas con relleno inicial, para que también sirvan a búsquedas por prefijo"""
+    padded = '^^' + token
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ClientSearchIndex:
+    """
+    Índice invertido en memoria por trigramas sobre rut, nombre, apellido, correo y
+    código de cliente. Se construye desde la base de datos y CRUDModel lo mantiene
+    al día en create_client / update_client / delete_client. Como cada proceso
+    tiene su propia copia, se reconstruye cada `refresh_seconds` para recoger
+    cambios hechos por otros procesos.
+    """
+
+    def __init__(self, db, refresh_seconds=0):
+        self.db = db
+        self.refresh_seconds = refresh_seconds
+        self._postings = {}  # trigrama -> set(id_cliente)
+        self._docs = {}      # id_cliente -> dict con SEARCH_FIELDS
+        self._lock = threading.RLock()       # protege el índice; nunca se toma durante la lectura de la base
+        self._build_lock = threading.Lock()  # una sola reconstrucción a la vez
+        self._built_at = None
+        self._journal = None  # cambios (id_cliente, doc | None) llegados durante una reconstrucción
+        self._refreshing = False
+
+    # --------------------------
+    # Construcción y mantenimiento
+    # --------------------------
+    @staticmethod
+    def _index(postings, docs, client_id, doc):
+        docs[client_id] = doc
+        for token in tokens(doc):
+            for gram in trigrams(token):
+                postings.setdefault(gram, set()).add(client_id)
+
+    @staticmethod
+    def _unindex(postings, docs, client_id):
+        doc = docs.pop(client_id, None)
+        if doc is None:
+            return
+        for token in tokens(doc):
+            for gram in trigrams(token):
+                ids = postings.get(gram)
+                if ids is not None:
+                    ids.discard(client_id)
+                    if not ids:
+                        del postings[gram]
+
+    def rebuild(self):
+        """
+        Reconstruir el índice completo recorriendo Clientes en streaming. El índice nuevo
+        se arma fuera del lock (búsquedas y cambios siguen sobre el actual); los cambios
+        que llegan mientras tanto se anotan y se reaplican sobre el nuevo antes de cambiarlo.
+        """
+        with self._build_lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        started = time.perf_counter()
+        with self._lock:
+            self._journal = []
+        try:
+            postings, docs = {}, {}
+            query = f"SELECT id_cliente, {', '.join(SEARCH_FIELDS)} FROM Clientes"
+            for rows in self.db.stream_query(query, compact=True):
+                for row in rows:
+                    self._index(postings, docs, row['id_cliente'], {field: row[field] for field in SEARCH_FIELDS})
+            with self._lock:
+                for client_id, doc in self._journal:
+                    self._unindex(postings, docs, client_id)
+                    if doc is not None:
+                        self._index(postings, docs, client_id, doc)
+                replayed = len(self._journal)
+                self._postings, self._docs = postings, docs
+                self._built_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._journal = None
+        logger.info("Índice de búsqueda construido: %d clientes (%d cambios reaplicados) en %.2fs",
+                    len(docs), replayed, time.perf_counter() - started)
+
+    def _ensure_built(self):
+        if self._built_at is None:
+            # la primera búsqueda espera la construcción, pero sin bloquear add/remove
+            with self._build_lock:
+                if self._built_at is None:
+                    self._rebuild()
+        elif self.refresh_seconds and time.monotonic() - self._built_at > self.refresh_seconds:
+            with self._lock:
+                if self._refreshing:
+                    return
+                self._refreshing = True
+            threading.Thread(target=self._background_rebuild, daemon=True).start()
+
+    def _background_rebuild(self):
+        try:
+            self.rebuild()
+        except Exception as e:
+            logger.error("Error reconstruyendo índice de búsqueda: %s", e)
+        finally:
+            self._refreshing = False
+
+    def invalidate(self):
+        """Descartar el índice; se reconstruye en la próxima búsqueda"""
+        with self._lock:
+            self._postings, self._docs = {}, {}
+            self._built_at = None
+
+    def _load(self, client_id):
+        query = f"SELECT {', '.join(SEARCH_FIELDS)} FROM Clientes WHERE id_cliente = %s"
+        row = self.db.execute_query(query, (client_id,), one=True)
+        return {field: row[field] for field in SEARCH_FIELDS} if row else None
+
+    def add(self, client_id, client):
+        """Indexar (o reindexar) un cliente"""
+        doc = {field: client.get(field) for field in SEARCH_FIELDS}
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((client_id, doc))
+            if self._built_at is None:
+                return  # se indexará al construir
+            self._unindex(self._postings, self._docs, client_id)
+            self._index(self._postings, self._docs, client_id, doc)
+
+    def update(self, client_id, changes):
+        """
+        Reindexar un cliente con los campos modificados. Si el cliente no está en el
+        índice se lee la fila completa, para no indexar un documento parcial.
+        """
+        with self._lock:
+            if self._built_at is None and self._journal is None:
+                return  # se indexará al construir
+            doc = self._docs.get(client_id)
+        if doc is None:
+            # la lectura puede ir a una réplica atrasada: los cambios se aplican encima igual
+            doc = self._load(client_id)
+            if doc is None:
+                return
+        self.add(client_id, dict(doc, **{field: changes[field] for field in SEARCH_FIELDS if field in changes}))
+
+    def remove(self, client_id):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((client_id, None))
+            self._unindex(self._postings, self._docs, client_id)
+
+    # --------------------------
+    # Búsqueda
+    # --------------------------
+    def search(self, text, limit=10, min_score=0.6):
+        """
+        Los `limit` clientes que mejor coinciden con `text`.
+        Cada palabra de la búsqueda se compara por trigramas; las coincidencias
+        por prefijo de una palabra o del RUT puntúan más.
+        """
+        self._ensure_built()
+        text = (text or '').strip()
+        if not text:
+            return []
+        if _RUT_PATTERN.match(text):
+            query_tokens = [normalize_rut(text).lower()]
+        else:
+            query_tokens = [t for t in _TOKEN_SPLIT.split(normalize_text(text)) if t]
+        if not query_tokens:
+            return []
+
+        with self._lock:
+            total = Counter()
+            for token in query_tokens:
+                grams = trigrams(token)
+                hits = Counter()
+                for gram in grams:
+                    hits.update(self._postings.get(gram, ()))
+                needed = len(grams) * min_score
+                for client_id, count in hits.items():
+                    if count >= needed:
+                        total[client_id] += count / len(grams)
+
+            # todas las palabras de la búsqueda deben coincidir
+            candidates = [(client_id, score) for client_id, score in total.items()
+                          if score >= len(query_tokens) * min_score]
+            # el desempate por prefijo solo se calcula para los mejores candidatos
+            candidates.sort(key=lambda item: -item[1])
+            ranked = []
+            for client_id, score in candidates[:limit * 20]:
+                doc = self._docs[client_id]
+                doc_tokens = tokens(doc)
+                prefix_hits = sum(1 for qt in query_tokens if any(dt.startswith(qt) for dt in doc_tokens))
+                ranked.append((score + prefix_hits, client_id, doc))
+
+        ranked.sort(key=lambda item: (-item[0], item[1]))
+        return [dict(doc, id_cliente=client_id) for _, client_id, doc in ranked[:limit]]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'clientes': len(self._docs),
+                'trigramas': len(self._postings),
+                'construido_hace': round(time.monotonic() - self._built_at, 1) if self._built_at else None,
+            }